@@ -0,0 +1,247 @@
+"""benchmark.py
+
+Benchmarks for the technology finder.
+
+
+== memory use of the graph
+
+$ python3 benchmark.py --graph-memory LIF_FILE N?
+
+Load LIF_FILE, which should be created by main.py, and build the graph used for
+feature extraction. Reports the memory used by the annotations and by the graph
+nodes, in total and per token. If N is given the document is repeated N times
+to simulate a larger input, the default is to use it once.
+
+
+== spaCy pipeline throughput
+
+$ python3 benchmark.py --spacy-throughput TEXT_DIR N?
+
+Process the first N text files in TEXT_DIR (all files if N is not given) with
+three versions of the spaCy pipeline: the full pipeline, the default pipeline
+of main.py without the components that are not used, and the pipeline without
+the parser that is used when dependencies are switched off. Reports documents
+and tokens per second for parsing only and for all processing except for the
+classifier. The files are processed once before timing to warm up.
+
+
+== vectorizers
+
+$ python3 benchmark.py --vectorizers FEATURES_FILE
+
+Compare the vectorizer with a vocabulary to the hashing vectorizer with 2**16
+and 2**18 columns. One in five lines of FEATURES_FILE, for example the features
+file of the SensorData model in data/models, is kept apart for testing and the
+rest is used to train a model with each vectorizer. Reports the time it took to
+train, the size of the saved model and vectorizer, the time it takes to load
+them, the accuracy on the test examples and the number of vectors classified
+per second, measured on the test lines repeated to at least 10,000 vectors.
+
+"""
+
+
+import os
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+
+from joblib import load
+
+import main
+import classify
+from classify import Trainer, _parse_line
+from classify import model_file_name, vectorizer_file_name
+from utils import open_file
+from utils.features import vectorizer_input
+
+from utils import read_file
+from utils.lif import LIF
+from utils.graph import create_graph
+
+
+def graph_memory(lif_file, repeat=1):
+    """Measure the memory used by the LIF annotations and by the graph created from
+    them, with the document repeated the given number of times."""
+    json_obj = _repeat_lif(json.loads(read_file(lif_file)), repeat)
+    tracemalloc.start()
+    m0 = tracemalloc.get_traced_memory()[0]
+    lif = LIF(json_object=json_obj)
+    m1 = tracemalloc.get_traced_memory()[0]
+    graph = create_graph(lif)
+    m2 = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tokens = len(graph.tokens)
+    print("$ python3 %s\n" % ' '.join(sys.argv))
+    print("tokens        %10d" % tokens)
+    print("sentences     %10d" % len(graph.sentences))
+    print("terms         %10d" % len(graph.terms))
+    print()
+    print("annotations   %10d bytes  %6d bytes/token" % (m1 - m0, (m1 - m0) / tokens))
+    print("graph         %10d bytes  %6d bytes/token" % (m2 - m1, (m2 - m1) / tokens))
+    print("total         %10d bytes  %6d bytes/token" % (m2 - m0, (m2 - m0) / tokens))
+
+
+# name, excluded components and whether the parser is used
+PIPELINES = (('full', [], True),
+             ('default', list(main.EXCLUDED_COMPONENTS), True),
+             ('no parser', list(main.EXCLUDED_COMPONENTS), False))
+
+
+def spacy_throughput(text_dir, n=sys.maxsize):
+    """Measure documents and tokens per second for versions of the spaCy pipeline,
+    for parsing only and for parsing followed by the rest of the processing."""
+    fnames = sorted(os.listdir(text_dir))[:n]
+    texts = [open(os.path.join(text_dir, fname)).read() for fname in fnames]
+    print("$ python3 %s\n" % ' '.join(sys.argv))
+    print("documents  %d\n" % len(texts))
+    print("%-12s  %-29s  %s" % ('pipeline', 'parsing', 'processing'))
+    for name, exclude, dependencies in PIPELINES:
+        main.set_pipeline(exclude, dependencies)
+        main.load_spacy()
+        list(main.NLP.pipe(texts, batch_size=main.BATCH_SIZE))
+        t0 = time.time()
+        tokens = sum(len(doc) for doc in main.NLP.pipe(texts, batch_size=main.BATCH_SIZE))
+        t1 = time.time()
+        finders = ((i, main.TechnologyFinder(None, None, text=text))
+                   for i, text in enumerate(texts))
+        for _ in main.run_finders(finders, classifier=False, write=False):
+            pass
+        t2 = time.time()
+        print("%-12s  %s  %s" % (name, _rates(len(texts), tokens, t1 - t0),
+                                 _rates(len(texts), tokens, t2 - t1)))
+
+
+# name, vectorizer and number of columns
+VECTORIZERS = (('dict', 'dict', None),
+               ('hash 2**16', 'hash', 2 ** 16),
+               ('hash 2**18', 'hash', 2 ** 18))
+
+# the test vectors are repeated to at least this many vectors for measuring the
+# throughput, since for a small number of vectors the time does not depend on
+# the number of vectors but on the number of columns
+THROUGHPUT_VECTORS = 10000
+
+
+def vectorizers(features_file):
+    """Compare training time, model size, load time, accuracy and throughput of the
+    vectorizers on the examples in a features file."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        train_file = os.path.join(tmpdir, 'train.txt')
+        lines = _split_features(features_file, train_file)
+        # the trainer prints progress, so the results are printed at the end
+        results = []
+        for name, vectorizer, n_features in VECTORIZERS:
+            model_name = os.path.join(tmpdir, name.replace(' ', '').replace('*', ''))
+            trainer = Trainer(train_file, model_name, vectorizer,
+                              n_features or classify.N_FEATURES)
+            t0 = time.time()
+            trainer.train()
+            train_time = time.time() - t0
+            files = (model_file_name(model_name), vectorizer_file_name(model_name))
+            size = sum(os.path.getsize(f) for f in files)
+            t0 = time.time()
+            model, vectorizer = [load(f) for f in files]
+            load_time = time.time() - t0
+            accuracy = _accuracy(trainer, model, vectorizer, lines)
+            dictionaries = [d for _, d in lines] * max(1, THROUGHPUT_VECTORS // len(lines))
+            t0 = time.time()
+            model.predict(vectorizer.transform(dictionaries))
+            rate = len(dictionaries) / max(time.time() - t0, 1e-9)
+            results.append("%-12s  %7.2fs  %10d  %7.3fs  %8s  %12d"
+                           % (name, train_time, size, load_time, accuracy, int(rate)))
+    print("\n$ python3 %s\n" % ' '.join(sys.argv))
+    print("%-12s  %8s  %10s  %8s  %8s  %12s" % ('vectorizer', 'train', 'size',
+                                                'load', 'accuracy', 'vectors/s'))
+    for result in results:
+        print(result)
+
+
+def _split_features(features_file, train_file):
+    """Write four in five lines of the features file to the train file and return
+    the others as a list of <term, dictionary> pairs."""
+    test = []
+    with open_file(features_file) as fh, open(train_file, 'w') as train:
+        for i, line in enumerate(fh):
+            if i % 5 == 4:
+                term, _, _, dictionary = _parse_line(line)
+                test.append((term, vectorizer_input(dictionary)))
+            else:
+                train.write(line)
+    return test
+
+
+def _accuracy(trainer, model, vectorizer, lines):
+    """Return the accuracy on the test lines that are known examples."""
+    examples = [(trainer._get_label(term), d) for term, d in lines]
+    examples = [(label, d) for label, d in examples if label in ('y', 'n')]
+    if not examples:
+        return 'n/a'
+    labels = model.predict(vectorizer.transform([d for _, d in examples]))
+    correct = sum(1 for (label, _), predicted in zip(examples, labels)
+                  if label == predicted)
+    return "%.3f" % (correct / len(examples))
+
+
+def _rates(docs, tokens, seconds):
+    seconds = max(seconds, 1e-9)
+    return "%7.1f docs/s %8d tok/s" % (docs / seconds, tokens / seconds)
+
+
+def _repeat_lif(json_obj, n):
+    """Return a copy of the LIF json object where the text and all annotations are
+    repeated n times. Offsets are shifted and identifiers get a suffix so that
+    the copies do not overlap."""
+    if n == 1:
+        return json_obj
+    text = json_obj['text']['@value']
+    views = []
+    for view in json_obj['views']:
+        annotations = []
+        for i in range(n):
+            shift = i * len(text)
+            for anno in view['annotations']:
+                annotations.append(_copy_annotation(anno, i, shift))
+        views.append({'id': view['id'], 'metadata': view['metadata'],
+                      'annotations': annotations})
+    return {'@context': json_obj.get('@context'),
+            'metadata': json_obj['metadata'],
+            'text': {'@value': text * n, 'language': json_obj['text'].get('language')},
+            'views': views}
+
+
+def _copy_annotation(anno, i, shift):
+    anno = dict(anno)
+    anno['id'] = "%s-%d" % (anno['id'], i)
+    for offset in ('start', 'end'):
+        if offset in anno:
+            anno[offset] += shift
+    features = dict(anno.get('features', {}))
+    for feat in ('governor', 'dependent'):
+        if features.get(feat) is not None:
+            features[feat] = "%s-%d" % (features[feat], i)
+    if 'dependencies' in features:
+        features['dependencies'] = ["%s-%d" % (d, i) for d in features['dependencies']]
+    anno['features'] = features
+    return anno
+
+
+if __name__ == '__main__':
+
+    if sys.argv[1] == '--graph-memory':
+        lif_file = sys.argv[2]
+        repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+        graph_memory(lif_file, repeat)
+
+    elif sys.argv[1] == '--spacy-throughput':
+        text_dir = sys.argv[2]
+        n = int(sys.argv[3]) if len(sys.argv) > 3 else sys.maxsize
+        spacy_throughput(text_dir, n)
+
+    elif sys.argv[1] == '--vectorizers':
+        features_file = sys.argv[2]
+        vectorizers(features_file)
+
+    else:
+        print("Nothing to do.")
@@ -6,15 +6,21 @@ processed corpus, model creation and classification.
 
 == feature extraction
 
-$ python3 classify.py --get-features PROCESSED_CORPUS FEATURES_FILE N?
+$ python3 classify.py --get-features PROCESSED_CORPUS FEATURES_FILE N? [--workers W]
 
 Collect all term feature vectors from PROCESSED_CORPUS and writes them to
-FEATURES_FILE. Limit to N files if the third argument is present, default is to
-process all files.
+FEATURES_FILE. The corpus can have LIF files and store files, for the latter
+only the terms are read. Limit to N files if the third argument is present, default is to
+process all files. Files are processed in alphabetical order. With --workers the
+files are split into shards that are processed by W worker processes, the
+output is the same as without workers.
 
 This also creates two files with terms and counts: terms-az.txt contains an
 aplhabetical list of all terms and terms-nr.txt a list of terms with frequency
-ordered on frequency. These can be used for any technology annotation effort.
+ordered on frequency, with terms of the same frequency in alphabetical order.
+These can be used for any technology annotation effort. Term counts are kept in
+memory for up to a million terms, after that they are written to temporary files
+next to FEATURES_FILE.
 
 Takes about 80 seconds on a high-end 2015 iMac for a corpus of 27M.
 
@@ -27,13 +33,36 @@ TODO:
 
 == model creation
 
-$ python3 classify.py --train FEATURES_FILE MODEL_NAME
+$ python3 classify.py --train FEATURES_FILE MODEL_NAME [--hash] [--n-features N] [--match M]
 
 This assumes that there are lists of technologies and non-technologies (these
 are not necessarily from the domain you are working on). All available lists in
-data/lists/technologies are used. Positive and negative examples will be created
-from those lists and the feature vectors from the corpus. These will be used to
-create the model.
+data/lists are used. Positive and negative examples will be created from those
+lists and the feature vectors from the corpus. These will be used to create the
+model.
+
+The lists are read into a seed index (see utils/seeds.py) which is saved in
+data/lists and reused until the lists change. Terms are normalized before they
+are looked up, by default a term is an example if it is on one of the lists and
+with --match head or --match substring it is also an example if it ends in or
+contains a term from one of the lists.
+
+By default features are turned into vectors by a vectorizer with a vocabulary
+of all feature values, which grows with the size of the corpus. With --hash the
+feature values are hashed into a fixed number of columns (2**16 or the number
+given by --n-features) at the cost of the occasional collision. This keeps the
+vectorizer small, but the model has a column for each hashed value, so its size
+depends on the number of columns and not on the corpus. The vectorizer is
+saved with the model, so the classifier uses whichever one the model was
+trained with.
+
+$ python3 classify.py --train-streaming FEATURES_FILE MODEL_NAME [--n-features N] [--match M]
+
+Like --train, but features are hashed instead of being mapped to columns with a
+vocabulary, and the model is updated one chunk of examples at a time while the
+features file is read. This reads the features file only once and does not
+need to keep the examples in memory, so it can be used for features files that
+are larger than the available memory.
 
 TODO:
 - need to do some experiments with sampling etcetera
@@ -45,11 +74,20 @@ TODO:
 
 == classification
 
-$ python3 classify.py --classify MODEL_FILE LIF_FILE OUT_FILE
+$ python3 classify.py --classify MODEL_FILE LIF_FILE OUT_FILE [--compact] [--incremental]
 
 Classify a LIF given the model handed in. The LIF is accumed to be created by
 the code in main.py. The output is another LIF file with a technologies view
-added.
+added, which is pretty printed unless the --compact option is used. Output is
+compressed if OUT_FILE ends in .gz or .zst. When classifying a directory the
+output files get the names of the input files, so compressed input files result
+in compressed output files. Files in the binary store format (with extension
+.lifs) are read and written as store files.
+
+A manifest of classified files is kept in the output directory. With the
+--incremental option the output directory may already exist and only files that
+are new, that changed or that were classified with another model are classified,
+which is also how an interrupted run is resumed.
 
 $ python3 classify.py --classify-vectors MODEL_FILE VECTORS_FILE LABELS_FILE
 
@@ -62,18 +100,39 @@ written to the labels file, one label per line.
 import os
 import sys
 import glob
-import time
-from operator import itemgetter
+import shutil
+import tempfile
+import multiprocessing
 
-from sklearn.feature_extraction import DictVectorizer
+from sklearn.feature_extraction import DictVectorizer, FeatureHasher
 from sklearn.naive_bayes import BernoulliNB
 from joblib import dump, load
 
 from utils import timer, logger
-from utils import read_file, open_file, exists, isfile, isdir
-from utils.lif import LIF, View
+from utils import open_file, exists, isfile, isdir
+from utils.lif import View
+from utils.store import load_lif, write_lif
+from utils.manifest import Manifest, MANIFEST_FILE, file_hash
 from utils.factory import AnnotationFactory
+from utils.counter import SpillingCounter, MAX_TERMS
+from utils.features import parse_vector, term_features, vectorizer_input
+from utils.seeds import SeedIndex, MATCHES
+
+
+# Number of vectors that are classified with one call to the model
+CHUNK_SIZE = 10000
+
+# Number of files in a shard when collecting features
+FILES_PER_SHARD = 100
+
+# Number of columns that features are hashed into by the streaming trainer
+N_FEATURES = 2 ** 16
 
+# Labels of training examples, the streaming trainer needs to know them upfront
+LABELS = ['n', 'y']
+
+# Fitted models and vectorizers loaded by this process, indexed on model name
+MODELS = {}
 
 class Vector(object):
 
@@ -104,46 +163,140 @@ def model_file_name(model_name):
     return "%s-model-fitted.jl" % model_name
 
 
-def get_features(directory, features_file, n):
+def load_model(model_name):
+    """Return the fitted model and the vectorizer for a model name. They are loaded
+    from disk only the first time they are asked for, after that they come from
+    the MODELS registry. Numpy arrays in the model files are memory mapped, so
+    processes that load the same model share their pages."""
+    key = os.path.normpath(model_name)
+    if key not in MODELS:
+        model = load(model_file_name(model_name), mmap_mode='r')
+        vectorizer = load(vectorizer_file_name(model_name), mmap_mode='r')
+        MODELS[key] = (model, vectorizer)
+    return MODELS[key]
+
+
+def model_version(model_name):
+    """Return a version string for a model, which changes when the model or the
+    vectorizer is retrained."""
+    hashes = [file_hash(model_file_name(model_name)),
+              file_hash(vectorizer_file_name(model_name))]
+    return "%s:%s" % (os.path.basename(model_name), ':'.join(h[:12] for h in hashes))
+
+
+def get_features(directory, features_file, n, workers=1, max_terms=MAX_TERMS):
     """Extract all term features from n files in the directory and write them as
-    vectors to the features file."""
+    vectors to the features file. Files are taken in alphabetical order and split
+    into shards that are handed to a pool of workers if workers > 1. Each shard
+    gets its own vectors file and term counts, which are merged in the order of
+    the shards so the result does not depend on the number of workers. Term
+    counts are written to disk when there are more than max_terms of them, in a
+    shard or after merging."""
+    fnames = sorted(glob.glob("%s/*" % directory))[:n]
+    shards = [fnames[i:i + FILES_PER_SHARD]
+              for i in range(0, len(fnames), FILES_PER_SHARD)]
+    tmpdir = os.path.dirname(os.path.abspath(features_file))
     with logger.Logger() as log, \
-         open(features_file, 'w') as fh_features, \
-         open('terms-az.txt', 'w') as fh_terms, \
-         open('terms-nr.txt', 'w') as fh_counts:
-        terms = {}
-        for (i, fname) in enumerate(glob.glob("%s/*" % directory)[:n]):
-            log.write_line(os.path.basename(fname), i)
-            content = read_file(fname)
-            lif = LIF(json_string=content)
+         tempfile.TemporaryDirectory(prefix='features-', dir=tmpdir) as tmpdir:
+        args = [(i, shard, tmpdir, max_terms) for i, shard in enumerate(shards)]
+        terms = SpillingCounter(tmpdir, max_terms)
+        with open_file(features_file, 'w', encoding='utf8') as fh_features:
+            if workers > 1:
+                with multiprocessing.Pool(workers) as pool:
+                    results = pool.imap(_get_shard_features, args)
+                    _merge_shards(results, fh_features, terms, log)
+            else:
+                results = map(_get_shard_features, args)
+                _merge_shards(results, fh_features, terms, log)
+        with open('terms-az.txt', 'w', encoding='utf8') as fh_terms:
+            for term, _ in terms.items():
+                fh_terms.write("%s\n" % term)
+        with open('terms-nr.txt', 'w', encoding='utf8') as fh_counts:
+            for term, count in terms.items_by_count():
+                fh_counts.write("%-4d\t%s\n" % (count, term))
+        log.write_time_elapsed()
+
+
+def _merge_shards(results, fh_features, terms, log):
+    """Append the vectors of each shard to the features file and collect the runs
+    and the term counts that were not written to a run, the results are expected
+    in the order of the shards."""
+    c = 0
+    for vectors_file, runs, counts, fnames in results:
+        for fname in fnames:
+            log.write_line(os.path.basename(fname), c)
+            c += 1
+        with open(vectors_file, encoding='utf8') as fh:
+            shutil.copyfileobj(fh, fh_features)
+        os.remove(vectors_file)
+        terms.add_runs(runs)
+        for term, count in counts.items():
+            terms.add(term, count)
+
+
+def _get_shard_features(args):
+    """Write the feature vectors of a shard of files to a vectors file in the
+    temporary directory and count the terms. Returns the vectors file, the runs
+    with term counts, the counts that were not written to a run and the file
+    names. Counts are only written to a run when a shard has more than max_terms
+    terms."""
+    i, fnames, tmpdir, max_terms = args
+    terms = SpillingCounter(tmpdir, max_terms)
+    vectors_file = os.path.join(tmpdir, "vectors-%06d.txt" % i)
+    with open(vectors_file, 'w', encoding='utf8') as fh_features:
+        for fname in fnames:
+            lif = load_lif(fname, views=['terms'], text=False)
             for term in lif.get_view('terms').annotations:
                 text = term.get_text()
                 if text is not None:
-                    text = text.strip().replace("\n", ' ')
-                    terms[text] = terms.get(text, 0) + 1
+                    terms.add(text.strip().replace("\n", ' '))
                 if 'vector' in term.features:
                     vector = Vector(fname, term)
                     fh_features.write("%s\n" % vector)
-        fh_terms.write("%s\n" % '\n'.join(sorted(terms)))
-        for (term, count) in reversed(sorted(terms.items(), key=itemgetter(1))):
-            fh_counts.write("%-4d\t%s\n" % (count, term))
-        log.write_time_elapsed()
+    return vectors_file, terms.runs, terms.counts, fnames
+
+
+def create_vectorizer(vectorizer='dict', n_features=N_FEATURES):
+    """Return a new vectorizer, which is a DictVectorizer with a column for each
+    feature value seen in training if vectorizer is 'dict' and a FeatureHasher
+    with n_features columns if vectorizer is 'hash'. The vectorizer is saved
+    next to the model and both have the same transform() method, so the
+    classifier does not need to know which one was used."""
+    if vectorizer == 'dict':
+        return DictVectorizer()
+    elif vectorizer == 'hash':
+        # features need to be positive since the model only looks at whether
+        # a value is larger than zero
+        return FeatureHasher(n_features=n_features, input_type='dict',
+                             alternate_sign=False)
+    raise ValueError("unknown vectorizer: %s" % vectorizer)
 
 
 class Trainer(object):
 
-    def __init__(self, features_file, model_name):
+    """Trainer that creates a model from the examples in a features file. With the
+    'dict' vectorizer all distinct feature values are collected in a vocabulary,
+    which grows with the corpus, with the 'hash' vectorizer feature values are
+    hashed into n_features columns. Terms are labeled with the seed index, using
+    the match given, which is one of 'exact', 'head' and 'substring'."""
+
+    def __init__(self, features_file, model_name, vectorizer='dict',
+                 n_features=N_FEATURES, match='exact'):
         self.features_file = features_file
         self.model_name = model_name
+        self.vectorizer = vectorizer
+        self.n_features = n_features
+        if match not in MATCHES:
+            raise ValueError("unknown match: %s" % match)
+        self.match = match
+        self.seeds = None
         self.vectors_file = vectors_file_name(model_name)
         self.vectorizer_file = vectorizer_file_name(model_name)
         self.model_file = model_file_name(model_name)
 
     @timer
     def train(self):
-        technologies, non_technologies = _read_seeds()
-        self.technology_seeds = technologies
-        self.non_technology_seeds = non_technologies
+        self.seeds = SeedIndex.load()
         self._create_examples()
         self._create_model()
 
@@ -165,16 +318,8 @@ class Trainer(object):
 
     def _get_label(self, term):
         """Return 'y' if term is a known technology, 'n' if it is a known non-technology
-        and '?' if it is both."""
-        # TODO: this is very simplistic now, should check substrings too
-        if term in self.technology_seeds and term in self.non_technology_seeds:
-            return '?'
-        elif term in self.technology_seeds:
-            return 'y'
-        elif term in self.non_technology_seeds:
-            return 'n'
-        else:
-            return None
+        and '?' if it is both or if it is not clear which one it is."""
+        return self.seeds.label(term, self.match)
 
     def _create_model(self):
         print('Creating and saving the model and the vectorizer...')
@@ -184,37 +329,84 @@ class Trainer(object):
             for line in vectors:
                 _, _, label, dictionary = _parse_line(line)
                 labels.append(label)
-                features.append(dictionary)
-        vectorizer = DictVectorizer()
+                features.append(vectorizer_input(dictionary))
+        vectorizer = create_vectorizer(self.vectorizer, self.n_features)
         feature_vectors = vectorizer.fit_transform(features)
         model = BernoulliNB()
         model.fit(feature_vectors, labels)
+        _ignore_unseen_columns(model)
         dump(model, self.model_file)
         dump(vectorizer, self.vectorizer_file)
 
 
-def _read_seeds():
-    """Read all the lists of technologies and non-technologies and create a set for
-    each of them."""
-    technologies = set()
-    non_technologies = set()
-    for techlist in glob.glob("data/lists/tech-*.txt"):
-        print('Reading', techlist)
-        for line in open(techlist):
-            tech = line.strip().lower()
-            technologies.add(tech)
-    for label_file in glob.glob("data/lists/labels-*.txt"):
-        print('Reading', label_file)
-        for line in open(label_file):
+class StreamingTrainer(Trainer):
+
+    """Trainer that reads the features file once and updates the model one chunk of
+    examples at a time, so memory use does not depend on the size of the features
+    file. Features are hashed into n_features columns, so there is no vocabulary
+    that needs to be collected before training. The vectors file is written in
+    the same pass."""
+
+    def __init__(self, features_file, model_name, n_features=N_FEATURES,
+                 chunk_size=CHUNK_SIZE, match='exact'):
+        super().__init__(features_file, model_name, 'hash', n_features, match)
+        self.chunk_size = chunk_size
+
+    @timer
+    def train(self):
+        self.seeds = SeedIndex.load()
+        print('Streaming feature vectors into the model...')
+        vectorizer = create_vectorizer('hash', self.n_features)
+        model = BernoulliNB()
+        examples = 0
+        with open_file(self.features_file) as feats, \
+             open_file(self.vectors_file, 'w') as vectors:
+            for labels, dictionaries in self._read_examples(feats, vectors):
+                model.partial_fit(vectorizer.transform(dictionaries), labels,
+                                  classes=LABELS)
+                examples += len(labels)
+        if examples == 0:
+            exit('Warning: no training examples in %s' % self.features_file)
+        _ignore_unseen_columns(model)
+        print('Saving the model and the vectorizer, trained on %d examples...' % examples)
+        dump(model, self.model_file)
+        dump(vectorizer, self.vectorizer_file)
+
+    def _read_examples(self, feats, vectors):
+        """Generate chunks of labels and feature dictionaries for the lines in the
+        features file that are positive or negative examples, which are also
+        written to the vectors file."""
+        labels = []
+        dictionaries = []
+        for line in feats:
             try:
-                (label, freq, tech) = line.rstrip().split('\t')
-                if label == 'y':
-                    technologies.add(tech.strip().lower())
-                elif label == 'n':
-                    non_technologies.add(tech.strip().lower())
-            except:
-                print('WARNING:\n%s' % line, end='')
-    return technologies, non_technologies
+                term, _, _, dictionary = _parse_line(line)
+                label = self._get_label(term)
+                if label in ('y', 'n'):
+                    vectors.write("%s\t%s" % (label, line))
+                    labels.append(label)
+                    dictionaries.append(vectorizer_input(dictionary))
+            except Exception as e:
+                print('ERROR:', e)
+            if len(labels) >= self.chunk_size:
+                yield labels, dictionaries
+                labels = []
+                dictionaries = []
+        if labels:
+            yield labels, dictionaries
+
+
+def _ignore_unseen_columns(model):
+    """Give the columns that do not occur in any training example the same
+    probabilities for all classes. BernoulliNB also counts features that are
+    absent, and for the many empty columns of a hashing vectorizer the absent
+    features would otherwise outweigh the features of the example and favour
+    the class with the most examples. With equal probabilities these columns
+    cancel out, as if they did not exist, which is what happens with the
+    vocabulary of the dict vectorizer."""
+    unseen = model.feature_count_.sum(axis=0) == 0
+    if unseen.any():
+        model.feature_log_prob_[:, unseen] = model.feature_log_prob_[:, unseen].mean(axis=0)
 
 
 def _parse_line(line):
@@ -225,7 +417,7 @@ def _parse_line(line):
 
     Returns the term, the location of the terms (file name plus offsets), the
     label (which will be None for the first format), and a dictionary of all
-    features creates from the feature bundle string.
+    features created from the feature bundle string by parse_vector().
 
     """
     fields = line.rstrip().split('\t')
@@ -235,132 +427,178 @@ def _parse_line(line):
         label = None
         doc, offsets, term, feats = fields
     location = "%s:%s" % (doc, offsets)
-    dictionary = {}
-    for feat in feats.split():
-        # TODO: must turn values for some features into integers
-        feat, val = feat.split('=', 1)
-        dictionary[feat] = val
-    return term, location, label, dictionary
+    return term, location, label, parse_vector(feats)
 
 
 class Classifier(object):
 
     """Classifier that uses the model handed in on initialization or the default
-    default model. Runs on a file or a directory."""
+    default model. Runs on a file or a directory. Models are taken from the
+    registry, so creating a classifier is cheap once its model was loaded."""
 
     DEFAULT_MODEL = 'data/models/SensorData'
 
     def __init__(self, model_name=None):
         """Initilialze with the model name."""
-        self.name = None
-        self.model = None
-        self.vectorizer = None
-        self._load_model()
-
-    def _load_model(self, model_name=None):
         if model_name is None:
             model_name = Classifier.DEFAULT_MODEL
-        if self.model is None:
-            self.name = model_name
-            self.model = load(model_file_name(model_name))
-            self.vectorizer = load(vectorizer_file_name(model_name))
+        self.name = model_name
+        self.model, self.vectorizer = load_model(model_name)
 
-    def run(self, inpath, outpath, n=sys.maxsize):
-        if exists(outpath):
+    def run(self, inpath, outpath, n=sys.maxsize, pretty=True, incremental=False):
+        if exists(outpath) and not (incremental and isdir(inpath)):
             exit("Warning: output already exists")
         elif isdir(inpath):
-            self.classify_directory(inpath, outpath)
+            self.classify_directory(inpath, outpath, n, pretty, incremental)
         elif isfile(inpath):
-            self.classify_file(inpath, outpath)
+            self.classify_file(inpath, outpath, pretty)
 
-    def classify_directory(self, inpath, outpath, n=sys.maxsize):
+    def classify_directory(self, inpath, outpath, n=sys.maxsize, pretty=True,
+                           incremental=False):
+        """Classify the files in a directory. In incremental mode the output
+        directory may exist and files whose output is current according to the
+        manifest in the output directory are skipped."""
         if not os.path.exists(outpath):
             os.makedirs(outpath)
-        with logger.Logger() as log:
-            fnames = list(sorted(os.listdir(inpath)))
+        with logger.Logger() as log, Manifest(outpath) as manifest:
+            version = model_version(self.name)
+            fnames = [f for f in sorted(os.listdir(inpath)) if f != MANIFEST_FILE]
             for c, fname in enumerate(fnames[:n]):
                 infile = os.path.join(inpath, fname)
                 outfile = os.path.join(outpath, fname)
+                if incremental and manifest.is_current(infile, outfile, version):
+                    continue
                 log.write_line(fname, c)
                 try:
-                    self.classify_file(infile, outfile)
+                    self.classify_file(infile, outfile, pretty)
+                    manifest.add(infile, outfile, version)
                 except Exception as e:
                     log.write_error(e)
                     log.write('ERROR: %s\n' % e)
             log.write_time_elapsed()
 
-    def classify_file(self, lif_file, out_file):
-        lif = LIF(json_string=read_file(lif_file))
+    def classify_file(self, lif_file, out_file, pretty=True):
+        lif = load_lif(lif_file)
         self.classify_lif(lif)
-        lif.write(fname=out_file, pretty=True)
-
-    def classify_lif(self, lif):
+        write_lif(lif, out_file, pretty=pretty)
+
+    def classify_lif(self, lif, factory=None):
+        """Add a technologies view to the LIF object. Technology annotations are
+        created by the factory handed in, which should be the factory of the
+        document, or by a new one if there is none. All terms are classified
+        with one call to the vectorizer and the model."""
+        if factory is None:
+            factory = AnnotationFactory()
         tech_view = lif.get_view('technologies')
         if tech_view is None:
             tech_view = View('technologies')
             lif.views.append(tech_view)
+        terms = []
+        dictionaries = []
         for anno in lif.get_view('terms').annotations:
-            vector = anno.features.get('vector')
-            if vector is None:
-                continue
-            # create a line with dummy values so we can reuse _parse_line
-            line = "LABEL\tDOC\tP1:P2\t%s\t%s" % (anno.text, vector)
-            _, _, _, dictionary = _parse_line(line)
-            feature_vectors = self.vectorizer.transform([dictionary])
-            label = self.model.predict(feature_vectors[0])
+            feats = term_features(anno)
+            if feats is not None:
+                terms.append(anno)
+                dictionaries.append(vectorizer_input(feats))
+        if not terms:
+            return
+        labels = self.model.predict(self.vectorizer.transform(dictionaries))
+        for anno, label in zip(terms, labels):
             if label == 'y':
-                tech_view.annotations.append(AnnotationFactory.technology_annotation(anno))
+                tech_view.annotations.append(factory.technology_annotation(anno))
 
-    def run_on_vectors(self, vectors_file, labels_file):
+    def run_on_vectors(self, vectors_file, labels_file, chunk_size=None):
         """Generate a lable for all vectors in the file. Useful for batch processing of
         a large number of vectors from some corpus. Results are written one label per
-        line to the standard output."""
-        with open(vectors_file) as vectors, open(labels_file, 'w') as labels:
-            features = []
-            feature_vectors = []
-            for line in vectors:
-                _, _, _, dictionary = _parse_line(line)
-                features.append(dictionary)
-                feature_vectors.append(self.vectorizer.transform([dictionary]))
-            for instance in feature_vectors:
-                labels.write(self.model.predict(instance)[0] + '\n')
+        line to the labels file."""
+        _classify_vectors_file(self.model, self.vectorizer, vectors_file, labels_file,
+                               chunk_size)
 
 
-def classify_vectors(model_name, vectors_file, labels_file):
+def classify_vectors(model_name, vectors_file, labels_file, chunk_size=None):
     """Generate a lable for all vectors in the file. Useful for batch processing of
     a large number of vectors from some corpus. Results are written one label per
-    line to the standard output."""
-    model = load(model_file_name(model_name))
-    vectorizer = load(vectorizer_file_name(model_name))
-    with open(vectors_file) as vectors, open(labels_file, 'w') as labels:
-        features = []
-        feature_vectors = []
-        for line in vectors:
-            _, _, _, dictionary = _parse_line(line)
-            features.append(dictionary)
-            feature_vectors.append(vectorizer.transform([dictionary]))
-        for instance in feature_vectors:
-            labels.write(model.predict(instance)[0] + '\n')
+    line to the labels file."""
+    model, vectorizer = load_model(model_name)
+    _classify_vectors_file(model, vectorizer, vectors_file, labels_file, chunk_size)
+
+
+def _classify_vectors_file(model, vectorizer, vectors_file, labels_file, chunk_size=None):
+    """Read the vectors file in chunks and classify each chunk with one call to the
+    vectorizer and one call to the model, so only one chunk of vectors is in
+    memory at any time."""
+    if chunk_size is None:
+        chunk_size = CHUNK_SIZE
+    with open_file(vectors_file) as vectors, open_file(labels_file, 'w') as labels:
+        for dictionaries in _read_dictionaries(vectors, chunk_size):
+            feature_vectors = vectorizer.transform(dictionaries)
+            for label in model.predict(feature_vectors):
+                labels.write(label + '\n')
+
+
+def _read_dictionaries(lines, chunk_size):
+    """Generate lists of at most chunk_size feature dictionaries from the lines."""
+    chunk = []
+    for line in lines:
+        _, _, _, dictionary = _parse_line(line)
+        chunk.append(vectorizer_input(dictionary))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _n_features(args):
+    """Return the value of the --n-features option or the default."""
+    if '--n-features' in args:
+        return int(args[args.index('--n-features') + 1])
+    return N_FEATURES
+
+
+def _match(args):
+    """Return the value of the --match option or the default."""
+    if '--match' in args:
+        return args[args.index('--match') + 1]
+    return 'exact'
 
 
 if __name__ == '__main__':
 
     if sys.argv[1] == '--get-features':
-        corpus = sys.argv[2]
-        outfile = sys.argv[3]
-        n = int(sys.argv[4]) if len(sys.argv) > 4 else sys.maxsize
-        get_features(corpus, outfile, n)
+        args = sys.argv[2:]
+        workers = 1
+        if '--workers' in args:
+            i = args.index('--workers')
+            workers = int(args[i + 1])
+            del args[i:i + 2]
+        corpus = args[0]
+        outfile = args[1]
+        n = int(args[2]) if len(args) > 2 else sys.maxsize
+        get_features(corpus, outfile, n, workers)
 
     elif sys.argv[1] == '--train':
         features = sys.argv[2]
         model = sys.argv[3]
-        Trainer(features, model).train()
+        vectorizer = 'hash' if '--hash' in sys.argv[4:] else 'dict'
+        n_features = _n_features(sys.argv[4:])
+        match = _match(sys.argv[4:])
+        Trainer(features, model, vectorizer, n_features, match).train()
+
+    elif sys.argv[1] == '--train-streaming':
+        features = sys.argv[2]
+        model = sys.argv[3]
+        n_features = _n_features(sys.argv[4:])
+        match = _match(sys.argv[4:])
+        StreamingTrainer(features, model, n_features, match=match).train()
 
     elif sys.argv[1] == '--classify':
         model = sys.argv[2]
         inpath = sys.argv[3]
         outpath = sys.argv[4]
-        Classifier(model).run(inpath, outpath)
+        pretty = '--compact' not in sys.argv[5:]
+        incremental = '--incremental' in sys.argv[5:]
+        Classifier(model).run(inpath, outpath, pretty=pretty, incremental=incremental)
 
     elif sys.argv[1] == '--classify-vectors':
         model = sys.argv[2]
@@ -3,79 +3,484 @@
 """
 
 import os
+import re
 import sys
 import json
+import time
 import argparse
+import multiprocessing
+import importlib.metadata
 
 import spacy
-
-from classify import Classifier
-from utils import exists, isdir, isfile, logger
-from utils.lif import LIF, View
-from utils.graph import create_graph
+from spacy.tokens import Doc
+
+from classify import Classifier, load_model, model_version
+from utils import exists, isdir, isfile, open_file, logger
+from utils import can_compress, compressed_file_name, lif_file_name
+from utils.lif import LIF, View, COMPACT_SEPARATORS
+from utils.store import STORE_EXTENSION, is_store_file, write_store
+from utils.graph import create_graph_from_doc
 from utils.features import add_term_features
 from utils.factory import AnnotationFactory
+from utils.manifest import Manifest, MANIFEST_FILE
+from utils.cache import DocCache, MAX_SIZE as MAX_CACHE_SIZE
 
 
 NLP = None
+SPACY_MODEL = "en_core_web_sm"
+
+# Components of the spaCy pipeline that are not loaded since nothing uses them
+EXCLUDED_COMPONENTS = ('ner', 'lemmatizer')
+
+# Excluded components and whether the parser is used, set with set_pipeline()
+EXCLUDE = list(EXCLUDED_COMPONENTS)
+DEPENDENCIES = True
+
+# Tags of tokens in chunks found without the parser, chunks end in a noun
+CHUNK_TAGS = {'DT', 'PDT', 'PRP$', 'JJ', 'JJR', 'JJS', 'CD', 'HYPH',
+              'NN', 'NNS', 'NNP', 'NNPS'}
+NOUN_TAGS = {'NN', 'NNS', 'NNP', 'NNPS'}
+DETERMINER_TAGS = {'DT', 'PDT', 'PRP$'}
+
+# Cache with spaCy analyses, used when it is opened with open_cache()
+CACHE = None
+
+# Default number of documents handed to spaCy at once when processing a directory
+BATCH_SIZE = 20
+
+# Longer texts are cut into chunks of at most this many characters which are
+# parsed separately, this is well below the maximum length spaCy accepts
+MAX_CHUNK_LENGTH = 100000
+
+# Chunks are cut after the last of these separators before the maximum length,
+# but only if the chunk is at least half of the maximum length, the separators
+# that end a sentence come first so that chunks in hard-wrapped text do not end
+# in the middle of a sentence
+SEPARATORS = ('\n\n', '. ', '? ', '! ', '\n', ' ')
+
+WHITESPACE = re.compile(r'\s')
 
 
 def load_spacy():
+    """Load the spaCy model with the components that are not excluded. Without
+    dependencies the parser is left out and sentences are found by the rule
+    based sentencizer, which is much cheaper."""
     global NLP
-    NLP = spacy.load("en_core_web_sm")
+    if DEPENDENCIES:
+        NLP = spacy.load(SPACY_MODEL, exclude=EXCLUDE)
+    else:
+        NLP = spacy.load(SPACY_MODEL, exclude=EXCLUDE + ['parser'])
+        NLP.add_pipe('sentencizer')
+
+
+def set_pipeline(exclude=None, dependencies=True):
+    """Set the components excluded from the spaCy pipeline and whether the parser
+    is used. This should be done before the model is loaded."""
+    global EXCLUDE, DEPENDENCIES
+    EXCLUDE = list(EXCLUDED_COMPONENTS if exclude is None else exclude)
+    DEPENDENCIES = dependencies
+
+
+def check_pipeline():
+    """Exit with a warning if a component that is excluded is not in the spaCy
+    model, or if the parser is excluded while dependencies are used. spaCy itself
+    ignores the names of components it does not have."""
+    components = spacy_components()
+    unknown = [c for c in EXCLUDE if c not in components]
+    if unknown:
+        exit('Warning: %s has no component named %s, it has %s'
+             % (SPACY_MODEL, ', '.join(unknown), ', '.join(components)))
+    if 'parser' in EXCLUDE and DEPENDENCIES:
+        exit('Warning: the parser can only be excluded with --dependencies-off')
+
+
+def spacy_components():
+    """Return the names of all components of the spaCy model, including those
+    that are disabled by default. They are taken from the meta data of the model,
+    so the model itself does not need to be loaded."""
+    if spacy.util.is_package(SPACY_MODEL):
+        path = spacy.util.get_package_path(SPACY_MODEL)
+    else:
+        path = SPACY_MODEL
+    meta = spacy.util.get_model_meta(path)
+    return meta.get('components', meta['pipeline'])
+
+
+def open_cache(directory, max_size):
+    """Use a cache of spaCy analyses in the directory, bounded to max_size bytes."""
+    global CACHE
+    CACHE = DocCache(directory, spacy_version(), max_size)
+
+
+def spacy_version():
+    """Return a version string for the spaCy model and the components that were
+    left out of the pipeline."""
+    try:
+        version = importlib.metadata.version(SPACY_MODEL)
+    except importlib.metadata.PackageNotFoundError:
+        version = spacy.__version__
+    excluded = sorted(EXCLUDE + ([] if DEPENDENCIES else ['parser']))
+    return "%s-%s%s" % (SPACY_MODEL, version, ''.join(' -' + c for c in excluded))
+
+
+def pipeline_version(classifier=True):
+    """Return a version string for the spaCy model and the classifier model used
+    for processing, this is what the manifest uses to decide whether an output
+    was created by the same models."""
+    classifier_version = model_version(Classifier.DEFAULT_MODEL) if classifier else None
+    return "%s/%s" % (spacy_version(), classifier_version)
 
 
 class Batch(object):
 
     """Class to manage processing of files and directories."""
 
-    def __init__(self, input, output):
+    def __init__(self, input, output, compress=None, store=False):
+        """Initialize with input and output paths. If compress is 'gz' or 'zst' the
+        output will be compressed with gzip or zstandard, output files are also
+        compressed if their names end in .gz or .zst. If store is True the output
+        is written in the binary columnar format of utils.store instead of as
+        LIF JSON files, this is also done for output files ending in .lifs."""
         self.input = input
         self.output = output
+        self.compress = compress
+        self.store = store
 
-    def run(self, classifier=True, limit=None, verbose=False):
-        if exists(self.output):
+    def run(self, classifier=True, limit=None, batch_size=BATCH_SIZE, workers=1,
+            stream_format='lif', pretty=True, incremental=False, verbose=False):
+        output = self.output if isdir(self.input) else self.output_file()
+        if exists(output) and not (incremental and isdir(self.input)):
             exit('Warning: output already exists')
+        elif not can_compress(self.compress):
+            exit('Warning: compression with zstandard needs the zstandard package')
+        elif self.store and self.compress:
+            exit('Warning: store files cannot be compressed')
         elif isdir(self.input):
             if self.output is None:
                 exit('Warning: output directory must be specified')
-            self.process_directory(classifier, limit=limit, verbose=verbose)
+            self.process_directory(classifier, limit=limit, batch_size=batch_size,
+                                   workers=workers, pretty=pretty,
+                                   incremental=incremental, verbose=verbose)
         elif isfile(self.input):
-            self.process_file(classifier, verbose)
+            self.process_file(classifier, pretty, verbose)
         elif self.input is None:
-            # TODO: implement this
-            print('piping input from standard input')
+            self.process_stream(classifier, batch_size, stream_format)
         else:
             print('Warning: input does not exist')
 
-    def process_file(self, classifier=True, verbose=False):
+    def process_file(self, classifier=True, pretty=True, verbose=False):
         if verbose:
             print("Processing file '%s'" % self.input)
-        TechnologyFinder(self.input, self.output).run(classifier, verbose)
-
-    def process_directory(self, classifier, limit=sys.maxsize, verbose=False):
-        # TODO: replace .txt extension with .lif extension
+        TechnologyFinder(self.input, self.output_file()).run(classifier, verbose,
+                                                            pretty=pretty)
+
+    def output_file(self):
+        """Return the name of the file that the output for an input file or for the
+        input stream is written to, which has the extension for the compression
+        method or for store files added if needed."""
+        if self.output is None:
+            return None
+        if self.store and self.input is not None and not is_store_file(self.output):
+            return self.output + STORE_EXTENSION
+        return compressed_file_name(self.output, self.compress)
+
+    def process_stream(self, classifier=True, batch_size=BATCH_SIZE, stream_format='lif'):
+        """Read newline-delimited JSON records with an id and a text from standard
+        input and write one JSON record per line to the output, which is standard
+        output if no output file was given. Output records have the id and either
+        the LIF object or the technologies, depending on stream_format, or an
+        error message if processing failed. Records are read lazily and written
+        as soon as they are ready, so at most one batch is in memory."""
+        if self.output is None:
+            outstream = sys.stdout
+        else:
+            outstream = open_file(self.output_file(), 'w')
+        try:
+            records = _read_records(sys.stdin)
+            for identifier, finder, error in run_finders(records, classifier, batch_size,
+                                                         write=False):
+                record = result_record(identifier, finder, error, stream_format)
+                outstream.write(json.dumps(record, separators=COMPACT_SEPARATORS) + '\n')
+                outstream.flush()
+        finally:
+            if outstream is not sys.stdout:
+                outstream.close()
+
+    def process_directory(self, classifier, limit=sys.maxsize, batch_size=BATCH_SIZE,
+                          workers=1, pretty=True, incremental=False, verbose=False):
+        """Process all files in the input directory. Texts are handed to spaCy in
+        batches of batch_size documents using NLP.pipe, after which each parsed
+        document goes through the rest of the processing by itself. With more
+        than one worker the sorted file list is cut into shards of batch_size
+        files which are handed out to a pool of processes. Output files have the
+        .txt extension replaced by .lif, followed by .gz or .zst if the output is
+        compressed, or by .lifs for store files.
+
+        Processed files are recorded in a manifest in the output directory. In
+        incremental mode the output directory may exist and files whose output
+        is current according to the manifest are skipped, so only new and
+        changed files are processed and an interrupted run can be resumed."""
         if verbose:
             print("Processing directory '%s'" % self.input)
         if not os.path.exists(self.output):
             os.makedirs(self.output)
-        with logger.Logger() as log:
-            fnames = list(sorted(os.listdir(self.input)))
-            for c, fname in enumerate(fnames[:limit]):
-                infile = os.path.join(self.input, fname)
-                outfile = os.path.join(self.output, fname)
-                log.write_line(fname, c)
-                try:
-                    TechnologyFinder(infile, outfile).run(classifier, verbose)
-                except Exception as e:
-                    log.write_error(e)
+        with logger.Logger() as log, Manifest(self.output) as manifest:
+            version = pipeline_version(classifier)
+            fnames = [f for f in sorted(os.listdir(self.input)) if f != MANIFEST_FILE]
+            extension = STORE_EXTENSION if self.store else '.lif'
+            jobs = [(c, os.path.join(self.input, fname),
+                     os.path.join(self.output,
+                                  lif_file_name(fname, self.compress, extension)))
+                    for c, fname in enumerate(fnames[:limit])]
+            if incremental:
+                jobs = [(c, infile, outfile) for c, infile, outfile in jobs
+                        if not manifest.is_current(infile, outfile, version)]
+            outfiles = {c: outfile for c, _, outfile in jobs}
+
+            def record(c, infile, error):
+                log.write_line(os.path.basename(infile), c)
+                if error is not None:
+                    log.write_error(error)
+                else:
+                    manifest.add(infile, outfiles[c], version)
+
+            if workers > 1:
+                self._process_in_parallel(jobs, classifier, batch_size, workers,
+                                          pretty, log, record)
+            else:
+                for c, infile, error in process_files(jobs, classifier, batch_size,
+                                                      pretty, verbose):
+                    record(c, infile, error)
             log.write_time_elapsed()
 
+    def _process_in_parallel(self, jobs, classifier, batch_size, workers, pretty, log,
+                             record):
+        """Process the jobs with a pool of workers, where each worker loads the
+        models once. Results are handed to record in the original order of the
+        files, and the throughput for each worker is written to the log."""
+        shards = [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+        throughput = {}
+        with multiprocessing.Pool(workers, initializer=_init_worker,
+                                  initargs=(classifier, CACHE,
+                                            (EXCLUDE, DEPENDENCIES))) as pool:
+            args = [(shard, classifier, batch_size, pretty) for shard in shards]
+            for worker, seconds, results in pool.imap(_process_shard, args):
+                for c, infile, error in results:
+                    record(c, infile, error)
+                files, total = throughput.get(worker, (0, 0))
+                throughput[worker] = (files + len(results), total + seconds)
+        for worker, (files, seconds) in sorted(throughput.items()):
+            log.write_throughput(worker, files, seconds)
+
+
+def process_files(jobs, classifier=True, batch_size=BATCH_SIZE, pretty=True,
+                  verbose=False):
+    """Process a list of <c, infile, outfile> jobs and generate a <c, infile,
+    error> triple for each of them, where error is None if processing went
+    fine. Files that cannot be loaded are reported as errors and skipped."""
+
+    def finders():
+        for c, infile, outfile in jobs:
+            yield (c, infile), _create_finder(infile=infile, outfile=outfile)
+
+    for (c, infile), finder, error in run_finders(finders(), classifier, batch_size,
+                                                  verbose, pretty=pretty):
+        yield c, infile, error
+
+
+def run_finders(finders, classifier=True, batch_size=BATCH_SIZE, verbose=False,
+                write=True, pretty=True):
+    """Run a stream of <key, finder> pairs, where finder is a TechnologyFinder or
+    the exception raised when creating it. Texts are handed to spaCy in batches
+    and <key, finder, error> triples are generated in the order of the input,
+    with error set to None if processing went fine. Output is written only if
+    write is True."""
+    if NLP is None:
+        load_spacy()
+
+    def texts():
+        for key, finder in finders:
+            # a finder that failed is still send down the pipe to keep the order
+            text = '' if isinstance(finder, Exception) else finder.lif.text.value
+            yield text, (key, finder)
+
+    for doc, (key, finder) in _parse_documents(texts(), batch_size):
+        if isinstance(finder, Exception):
+            yield key, None, finder
+            continue
+        try:
+            finder.process(classifier, verbose, doc=doc)
+            if write:
+                finder.write_output(pretty)
+            yield key, finder, None
+        except Exception as e:
+            yield key, finder, e
+
+
+def _parse_documents(texts, batch_size=BATCH_SIZE):
+    """Parse a stream of <text, context> pairs and generate <doc, context> pairs in
+    the same order. Long texts are cut into chunks that are parsed on their own,
+    so spaCy never needs the memory for a whole long text. The documents for the
+    chunks are then joined into one document which has the offsets and token
+    indexes of the text as a whole."""
+
+    def chunks():
+        for text, context in texts:
+            text_chunks = split_text(text)
+            for i, chunk in enumerate(text_chunks):
+                yield chunk, (context, i == len(text_chunks) - 1)
+
+    docs = []
+    for doc, (context, last) in _parse(chunks(), batch_size):
+        docs.append(doc)
+        if last:
+            yield _join_docs(docs), context
+            docs = []
+
+
+def split_text(text, max_length=MAX_CHUNK_LENGTH):
+    """Split the text into chunks of at most max_length characters. Chunks end at
+    the end of a paragraph if possible, and otherwise at the end of a sentence, at
+    the end of a line or at a space. Chunks never end inside a token, so a chunk
+    can only be longer than max_length if it has a token that long. Joining the
+    chunks gives back the text."""
+    chunks = []
+    start = 0
+    while len(text) - start > max_length:
+        end = _chunk_end(text, start, max_length)
+        if end >= len(text):
+            break
+        chunks.append(text[start:end])
+        start = end
+    chunks.append(text[start:])
+    return chunks
+
+
+def _chunk_end(text, start, max_length):
+    """Return the end of the chunk that starts at start. If there is no separator
+    in the second half of the chunk the chunk ends after the last whitespace, or
+    after the first whitespace following the chunk if there is none in it."""
+    for separator in SEPARATORS:
+        i = text.rfind(separator, start + max_length // 2, start + max_length)
+        if i > -1:
+            return i + len(separator)
+    last = None
+    for last in WHITESPACE.finditer(text, start, start + max_length):
+        pass
+    if last is not None and last.end() > start:
+        return last.end()
+    following = WHITESPACE.search(text, start + max_length)
+    return len(text) if following is None else following.end()
+
+
+def _join_docs(docs):
+    """Join the documents for the chunks of a text. The tensors are left out since
+    they are not used after parsing and copying them takes a lot of memory."""
+    if len(docs) == 1:
+        return docs[0]
+    return Doc.from_docs(docs, ensure_whitespace=False, exclude=['tensor'])
+
+
+def _parse(texts, batch_size=BATCH_SIZE):
+    """Parse a stream of <text, context> pairs with spaCy and generate <doc,
+    context> pairs in the same order. If there is a cache, texts are looked up
+    per batch and only the texts that are not in the cache are parsed."""
+    if CACHE is None:
+        yield from NLP.pipe(texts, as_tuples=True, batch_size=batch_size)
+        return
+    batch = []
+    for text, context in texts:
+        batch.append((text, context))
+        if len(batch) >= batch_size:
+            yield from _parse_batch(batch, batch_size)
+            batch = []
+    yield from _parse_batch(batch, batch_size)
+
+
+def _parse_batch(batch, batch_size):
+    docs = []
+    for text, _ in batch:
+        data = CACHE.get(text)
+        docs.append(None if data is None else Doc(NLP.vocab).from_bytes(data))
+    misses = [(text, i) for i, (text, _) in enumerate(batch) if docs[i] is None]
+    for doc, i in NLP.pipe(misses, as_tuples=True, batch_size=batch_size):
+        # the tensor is only used by the pipeline and is by far the largest part
+        CACHE.put(batch[i][0], doc.to_bytes(exclude=['tensor']))
+        docs[i] = doc
+    for doc, (_, context) in zip(docs, batch):
+        yield doc, context
+
+
+def _create_finder(infile=None, outfile=None, text=None):
+    """Return a new TechnologyFinder or the exception raised when creating it."""
+    try:
+        return TechnologyFinder(infile, outfile, text=text)
+    except Exception as e:
+        return e
+
+
+def _init_worker(classifier, cache=None, pipeline=None):
+    """Load the spaCy model and, if needed, the classifier model when a worker
+    process starts. The worker uses the cache and the pipeline settings of the
+    main process, which are handed in."""
+    global CACHE
+    CACHE = cache
+    if pipeline is not None:
+        set_pipeline(*pipeline)
+    load_spacy()
+    if classifier:
+        load_model(Classifier.DEFAULT_MODEL)
+
+
+def _process_shard(args):
+    """Process a shard of jobs in a worker process. Returns the name of the worker,
+    the time it took and the results, with errors turned into strings so they
+    can be send back to the main process."""
+    shard, classifier, batch_size, pretty = args
+    t0 = time.time()
+    results = [(c, infile, None if error is None else str(error))
+               for c, infile, error in process_files(shard, classifier, batch_size,
+                                                     pretty)]
+    return multiprocessing.current_process().name, time.time() - t0, results
+
+
+def _read_records(lines):
+    """Generate <identifier, finder> pairs from lines with JSON records. Records
+    that cannot be read come with an exception instead of a finder."""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield None, e
+            continue
+        if not isinstance(record, dict):
+            yield None, ValueError("record is not a JSON object")
+        elif not isinstance(record.get('text'), str):
+            yield record.get('id'), ValueError("record has no text")
+        else:
+            yield record.get('id'), _create_finder(text=record['text'])
+
+
+def result_record(identifier, finder, error, stream_format):
+    """Return the output record for the result of processing one input record."""
+    if error is not None:
+        return {"id": identifier, "error": str(error)}
+    if stream_format == 'technologies':
+        tech_view = finder.lif.get_view('technologies')
+        annotations = [] if tech_view is None else tech_view.annotations
+        technologies = [{"start": anno.start, "end": anno.end, "text": anno.get_text()}
+                        for anno in annotations]
+        return {"id": identifier, "technologies": technologies}
+    return {"id": identifier, "lif": finder.lif.as_json()}
+
 
 class TechnologyFinder(object):
 
-    def __init__(self, infile, outfile):
-        AnnotationFactory.reset()
+    def __init__(self, infile, outfile, text=None):
+        """Initialize with the input file and the output file. If text is given it
+        is used instead of the contents of the input file."""
         if NLP is None:
             load_spacy()
         self.infile = infile
@@ -83,34 +488,50 @@ class TechnologyFinder(object):
         self.lif = None
         self.doc = None
         self.graph = None
-        self._create_lif()
-
-    def run(self, classifier=True, verbose=False):
-        self._run_spacy(verbose)
+        self.factory = AnnotationFactory()
+        # spaCy spans and tokens paired with the annotations created for them
+        self.sentences = []
+        self.tokens = []
+        self.terms = []
+        self._create_lif(text)
+
+    def run(self, classifier=True, verbose=False, doc=None, pretty=True):
+        """Run all processing steps and write the output. If doc is given it is
+        assumed to be the spaCy analysis of the text, which is then not parsed
+        again."""
+        self.process(classifier, verbose, doc)
+        self.write_output(pretty)
+
+    def process(self, classifier=True, verbose=False, doc=None):
+        """Run all processing steps without writing the output."""
+        self._run_spacy(verbose, doc)
         self._create_graph(verbose)
         self._add_features(verbose)
         if classifier:
             self._classify_terms(verbose)
-        self._write_output()
 
-    def _create_lif(self):
+    def _create_lif(self, text=None):
         """Create a new LIF object, load the textinto it and initialize three views."""
         self.lif = LIF()
-        self.lif.text.value = open(self.infile).read()
+        self.lif.text.value = open(self.infile).read() if text is None else text
         tok_view = View("tokens")
         chk_view = View("chunks")
         dep_view = View("dependencies")
         term_view = View("terms")
         self.lif.views.extend([tok_view, dep_view, term_view])
 
-    def _run_spacy(self, verbose):
+    def _run_spacy(self, verbose, doc=None):
         """Run the spaCy NLP model and add NLP analysis elements as annotations to the
-        LIF object."""
+        LIF object. The model does not need to run if the document was already
+        parsed by the caller. Long texts are parsed in chunks, which are then
+        joined into one document."""
         # NOTE: maybe this piece should just add all information we want to get
         # from spaCy and at this point we stipulate that chunks are the initial
         # terms; maybe pull out chunks and store as chunk objects, then later
         # use those to collect terms or filter them
-        self.doc = NLP(self.lif.text.value)
+        if doc is None:
+            doc, _ = next(_parse_documents([(self.lif.text.value, None)]))
+        self.doc = doc
         self._add_annotations(verbose)
         self._add_term_annotations()
 
@@ -119,12 +540,16 @@ class TechnologyFinder(object):
         and dependency views."""
         self.pos_view = self.lif.get_view("tokens")
         self.dep_view = self.lif.get_view("dependencies")
-        for annotation in _get_sentence_annotations(self.doc):
+        sentence_annotations = _get_sentence_annotations(self.doc, self.factory)
+        self.sentences = list(zip(self.doc.sents, sentence_annotations))
+        self.tokens = [None] * len(self.doc)
+        for annotation in sentence_annotations:
             self.pos_view.annotations.append(annotation)
         for sentence in _get_sentences_and_tokens(self.doc):
             idx2id = {}
             self._add_annotations_first_pass(sentence, idx2id, verbose)
-            self._add_annotations_second_pass(sentence, idx2id, verbose)
+            if DEPENDENCIES:
+                self._add_annotations_second_pass(sentence, idx2id, verbose)
             if verbose:
                 print()
 
@@ -132,8 +557,9 @@ class TechnologyFinder(object):
         """Create all token annotations and add them and build an index from the
         sentence offsets to the token identifiers."""
         for token in sentence:
-            tok_annotation = AnnotationFactory.token_annotation(token)
+            tok_annotation = self.factory.token_annotation(token)
             self.pos_view.annotations.append(tok_annotation)
+            self.tokens[token.i] = tok_annotation
             idx2id[token.i] = "%s:%s" % (self.pos_view.id, tok_annotation.id)
             if verbose:
                 print("%2s  %2s  %2s  %3s  %-12s  %-5s    %-8s  %-10s  %2s  %s"
@@ -149,28 +575,32 @@ class TechnologyFinder(object):
         and add it and then add all dependencies."""
         dep_annos = []
         for token in sentence:
-            dep_annotation = AnnotationFactory.dependency_annotation(token, idx2id)
+            dep_annotation = self.factory.dependency_annotation(token, idx2id)
             dep_annos.append(dep_annotation)
-        dep_struct = AnnotationFactory.dependency_structure_annotation(dep_annos)
+        dep_struct = self.factory.dependency_structure_annotation(dep_annos)
         self.dep_view.annotations.append(dep_struct)
         for dep_anno in dep_annos:
             self.dep_view.annotations.append(dep_anno)
 
     def _add_term_annotations(self):
         """Add candidate terms as annotations. For now we just use the noun chunks from
-        the spaCy analysis."""
+        the spaCy analysis, or chunks found from the tags if there is no parse."""
         # TODO: filter out some chunks, like proper names
         # TODO: if term has 1 element and last element is pos=PRP
         # TODO: the problem is that at this point we do not have that information since
         # TODO: all we have is the span and it is not linked to the tokens yet
         term_view = self.lif.get_view("terms")
-        for term in self.doc.noun_chunks:
-            anno = AnnotationFactory.term_annotation(term)
+        chunks = self.doc.noun_chunks if DEPENDENCIES else _tag_chunks(self.doc)
+        for term in chunks:
+            anno = self.factory.term_annotation(term)
             term_view.annotations.append(anno)
+            self.terms.append((term, anno))
 
     def _create_graph(self, verbose):
-        """Create a graph from the LIF object."""
-        self.graph = create_graph(self.lif)
+        """Create a graph from the spaCy document and the annotations created for
+        it, which avoids reading the annotations back from the LIF views."""
+        self.graph = create_graph_from_doc(self.doc, self.sentences, self.tokens,
+                                           self.terms, dependencies=DEPENDENCIES)
         if verbose:
             self.graph.print_sentences()
 
@@ -180,32 +610,64 @@ class TechnologyFinder(object):
 
     def _classify_terms(self, verbose):
         # When called from this main script we use the small default classifier
-        # (triggered by None as the first argument)
-        Classifier().classify_lif(self.lif)
-        #classify_lif(None, self.lif)
+        # (triggered by None as the first argument), its model is loaded once
+        Classifier().classify_lif(self.lif, self.factory)
 
-    def _write_output(self):
+    def write_output(self, pretty=True):
         """Save the LIF object into outfile or write it to standard output if outfile is
-        equal to None."""
-        json_string = self.lif.as_json_string()
-        if self.outfile is not None:
-            with open(self.outfile, 'w') as fh:
-                fh.write(json_string)
+        equal to None. The pretty form is indented and has sorted keys, the compact
+        form has no spaces and is written one view at a time. The output is
+        compressed while it is written if the file name ends in .gz or .zst. Files
+        ending in .lifs are written in the binary columnar store format."""
+        if self.outfile is not None and is_store_file(self.outfile):
+            write_store(self.lif, self.outfile)
+        elif self.outfile is not None:
+            with open_file(self.outfile, 'w') as fh:
+                self.lif.dump(fh, pretty)
         else:
-            print(json_string)
+            self.lif.dump(sys.stdout, pretty)
+            print()
 
 
-def _get_sentence_annotations(doc):
+def _get_sentence_annotations(doc, factory):
     annotations = []
     for s in doc.sents:
         w1 = doc[s.start]
         w2 = doc[s.end - 1]
         p1 = w1.idx
         p2 = w2.idx + len(w2)
-        annotations.append(AnnotationFactory.sentence_annotation(s, doc))
+        annotations.append(factory.sentence_annotation(s, doc))
     return annotations
 
 
+def _tag_chunks(doc):
+    """Return noun chunks found from tag patterns, for when there is no parse to
+    get spaCy's noun chunks from. A chunk is a sequence of determiners,
+    adjectives, numbers and nouns in a sentence that ends in a noun, a new chunk
+    starts at a determiner after a noun. Pronouns are chunks by themselves, as
+    they are for spaCy."""
+    chunks = []
+    for sent in doc.sents:
+        start = last_noun = None
+        for token in sent:
+            tag = token.tag_
+            if (tag not in CHUNK_TAGS
+                    or (tag in DETERMINER_TAGS and last_noun is not None)):
+                if last_noun is not None:
+                    chunks.append(doc[start:last_noun + 1])
+                start = last_noun = None
+            if tag == 'PRP':
+                chunks.append(doc[token.i:token.i + 1])
+            elif tag in CHUNK_TAGS:
+                if start is None:
+                    start = token.i
+                if tag in NOUN_TAGS:
+                    last_noun = token.i
+        if last_noun is not None:
+            chunks.append(doc[start:last_noun + 1])
+    return chunks
+
+
 def _get_sentences_and_tokens(doc):
     """Return a list of sentences where each sentence is a list of tokens as
     extracted from the document, which is an instance of spacy.tokens.doc.Doc."""
@@ -222,7 +684,8 @@ if __name__ == '__main__':
 
     h_input = \
         "The input file or input directory to process," \
-        + " take standard input if this is not specified."
+        + " take standard input if this is not specified, in which case" \
+        + " input is a stream of JSON records with an id and a text."
     h_output = \
         "The output file or output directory to write the results to," \
         + " write to standard output if not specified. If INPUT is a" \
@@ -231,6 +694,30 @@ if __name__ == '__main__':
     h_classifier = "Switch of the classifier."
     h_verbose = "Print some of the created data structures to standard output."
     h_limit = "The maximum number of files to process."
+    h_workers = "The number of worker processes used when processing a directory."
+    h_stream_format = "What to write for each record when reading JSON records" \
+        + " from standard input, either the LIF object or just the technologies."
+    h_compact = "Write compact LIF output without indentation and with unsorted" \
+        + " keys, the default is to pretty print the output."
+    h_compress = "Compress the output with gzip or zstandard, the latter is faster" \
+        + " but needs the zstandard package. Output is also compressed if the" \
+        + " name of the output file ends in .gz or .zst."
+    h_store = "Write output in the binary columnar store format, which is faster" \
+        + " to read than LIF JSON (see utils/store.py)."
+    h_incremental = "Only process files in the input directory that are new or" \
+        + " changed, or that were processed with other models, according to the" \
+        + " manifest in the output directory, which may already exist."
+    h_cache = "Keep spaCy analyses in a cache in this directory, texts that are" \
+        + " in the cache are not parsed again."
+    h_cache_size = "The maximum size of the cache in megabytes (default is %d)." \
+        % (MAX_CACHE_SIZE >> 20)
+    h_spacy_exclude = "Comma-separated components of the spaCy pipeline that are" \
+        + " not loaded (default is %s)." % ','.join(EXCLUDED_COMPONENTS)
+    h_dependencies = "Do not run the dependency parser, sentences are found with a" \
+        + " rule-based sentencizer and terms from tag patterns. There will be no" \
+        + " dependencies in the output and no dependency features."
+    h_batch_size = "The number of documents spaCy parses at once" \
+        + " when processing a directory (default is %d)." % BATCH_SIZE
 
     parser = argparse.ArgumentParser()
     parser.add_argument("-i", metavar='INPUT', help=h_input)
@@ -239,8 +726,33 @@ if __name__ == '__main__':
                         help=h_classifier, action="store_false")
     parser.add_argument("--verbose", help=h_verbose, action="store_true")
     parser.add_argument("--limit", help=h_limit, type=int)
+    parser.add_argument("--batch-size", help=h_batch_size, type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", help=h_workers, type=int, default=1)
+    parser.add_argument("--compact", dest='pretty', help=h_compact, action="store_false")
+    parser.add_argument("--compress", help=h_compress, choices=['gz', 'zst'])
+    parser.add_argument("--store", help=h_store, action="store_true")
+    parser.add_argument("--incremental", help=h_incremental, action="store_true")
+    parser.add_argument("--spacy-exclude", metavar='COMPONENTS', help=h_spacy_exclude,
+                        default=','.join(EXCLUDED_COMPONENTS))
+    parser.add_argument("--dependencies-off", dest='dependencies',
+                        help=h_dependencies, action="store_false")
+    parser.add_argument("--cache", metavar='DIR', help=h_cache)
+    parser.add_argument("--cache-size", help=h_cache_size, type=int,
+                        default=MAX_CACHE_SIZE >> 20)
+    parser.add_argument("--stream-format", help=h_stream_format,
+                        choices=['lif', 'technologies'], default='lif')
     args = parser.parse_args()
 
-    Batch(args.i, args.o).run(limit=args.limit,
+    set_pipeline([c for c in args.spacy_exclude.split(',') if c], args.dependencies)
+    check_pipeline()
+    if args.cache is not None:
+        open_cache(args.cache, args.cache_size << 20)
+
+    Batch(args.i, args.o, args.compress, args.store).run(limit=args.limit,
+                              batch_size=args.batch_size,
+                              workers=args.workers,
+                              stream_format=args.stream_format,
+                              pretty=args.pretty,
+                              incremental=args.incremental,
                               verbose=args.verbose,
                               classifier=args.classifier)
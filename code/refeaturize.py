@@ -0,0 +1,120 @@
+"""refeaturize.py
+
+Recompute the term features of files that were already processed by main.py,
+without running spaCy again. This is useful after changes to the feature
+extraction in utils/features.py.
+
+$ python3 refeaturize.py -i INPUT -o OUTPUT [--workers N] [--classifier-off] [--compact]
+
+INPUT is a LIF file or store file created by main.py, or a directory with such
+files, and OUTPUT is the file or directory the results are written to, using
+the same file names and formats as the input. For each file the graph is
+created from the tokens, dependencies and terms views, the vectors on the terms
+are replaced with newly computed ones and, since the technologies depend on the
+vectors, the technologies view is created again by the classifier. With the
+--classifier-off option the technologies view is removed instead. All other
+views are written back as they were read.
+
+With --workers the files in a directory are handed out to a pool of processes.
+
+"""
+
+import os
+import argparse
+import multiprocessing
+
+from classify import Classifier, load_model
+from utils import exists, isdir, isfile, logger
+from utils.store import load_lif, write_lif
+from utils.graph import create_graph
+from utils.features import add_term_features
+from utils.manifest import MANIFEST_FILE
+
+
+def refeaturize(lif, classifier=True):
+    """Replace the term vectors in the LIF object and recreate or remove the
+    technologies view."""
+    for term in lif.get_view('terms').annotations:
+        term.vector = None
+        term.features.pop('vector', None)
+    add_term_features(create_graph(lif))
+    lif.views = [view for view in lif.views if view.id != 'technologies']
+    if classifier:
+        Classifier().classify_lif(lif)
+    return lif
+
+
+def refeaturize_file(infile, outfile, classifier=True, pretty=True):
+    lif = load_lif(infile)
+    refeaturize(lif, classifier)
+    write_lif(lif, outfile, pretty=pretty)
+
+
+def refeaturize_directory(indir, outdir, classifier=True, pretty=True, workers=1):
+    """Refeaturize all files in the input directory and write the results to the
+    output directory, using the same file names."""
+    if not os.path.exists(outdir):
+        os.makedirs(outdir)
+    with logger.Logger() as log:
+        fnames = [f for f in sorted(os.listdir(indir)) if f != MANIFEST_FILE]
+        jobs = [(c, os.path.join(indir, fname), os.path.join(outdir, fname),
+                 classifier, pretty)
+                for c, fname in enumerate(fnames)]
+        if workers > 1:
+            with multiprocessing.Pool(workers, initializer=_init_worker,
+                                      initargs=(classifier,)) as pool:
+                results = pool.imap(_refeaturize_job, jobs, chunksize=10)
+                _log_results(results, log)
+        else:
+            _log_results(map(_refeaturize_job, jobs), log)
+        log.write_time_elapsed()
+
+
+def _log_results(results, log):
+    for c, infile, error in results:
+        log.write_line(os.path.basename(infile), c)
+        if error is not None:
+            log.write_error(error)
+
+
+def _init_worker(classifier):
+    if classifier:
+        load_model(Classifier.DEFAULT_MODEL)
+
+
+def _refeaturize_job(job):
+    """Refeaturize one file, returns the error as a string if there was one so it
+    can be send back from a worker process."""
+    c, infile, outfile, classifier, pretty = job
+    try:
+        refeaturize_file(infile, outfile, classifier, pretty)
+        return c, infile, None
+    except Exception as e:
+        return c, infile, str(e)
+
+
+if __name__ == '__main__':
+
+    h_input = "A LIF file or store file created by main.py or a directory with such files."
+    h_output = "The output file or directory, which should not exist."
+    h_classifier = "Remove the technologies view instead of running the classifier."
+    h_workers = "The number of processes used for a directory (default is 1)."
+    h_compact = "Write compact instead of pretty printed LIF output."
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", metavar='INPUT', help=h_input, required=True)
+    parser.add_argument("-o", metavar='OUTPUT', help=h_output, required=True)
+    parser.add_argument("--classifier-off", dest='classifier',
+                        help=h_classifier, action="store_false")
+    parser.add_argument("--workers", help=h_workers, type=int, default=1)
+    parser.add_argument("--compact", dest='pretty', help=h_compact, action="store_false")
+    args = parser.parse_args()
+
+    if exists(args.o):
+        exit('Warning: output already exists')
+    elif isdir(args.i):
+        refeaturize_directory(args.i, args.o, args.classifier, args.pretty, args.workers)
+    elif isfile(args.i):
+        refeaturize_file(args.i, args.o, args.classifier, args.pretty)
+    else:
+        print('Warning: input does not exist')
@@ -0,0 +1,287 @@
+"""server.py
+
+A long-running local server that keeps the spaCy model and the classifier model
+loaded so that documents can be processed without paying for loading the models
+each time.
+
+$ python3 server.py --port PORT
+$ python3 server.py --socket SOCKET_FILE
+
+The first form listens for HTTP requests on localhost, the second uses HTTP over
+a Unix socket. The server has three endpoints:
+
+POST /annotate
+
+   Process a text. The body is a JSON object with a text and optionally an id
+   and a format ("lif" or "technologies", default is "lif"). The response has
+   the same form as the records written by main.py when it reads from standard
+   input. Texts from concurrent requests are parsed by spaCy in one batch.
+
+POST /classify
+
+   Classify the terms in a LIF object. The body is a LIF object as created by
+   main.py with the classifier switched off and the response is that object with
+   a technologies view added. This endpoint always uses the classifier, also
+   when the server was started with the classifier switched off.
+
+GET /stats
+
+   Return the number of requests and the 50th, 90th and 99th percentile of the
+   latency in milliseconds for /annotate and /classify.
+
+For example:
+
+$ curl -s localhost:8000/annotate -d '{"text": "A thermometer measures temperature."}'
+$ curl -s --unix-socket SOCKET_FILE http://localhost/stats
+
+"""
+
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from socketserver import ThreadingMixIn, UnixStreamServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import main
+from main import TechnologyFinder, run_finders, result_record
+from classify import Classifier, load_model
+from utils.lif import LIF
+
+
+# Default maximum number of texts parsed together and the maximum time in
+# seconds that a text waits for other texts to join its batch
+BATCH_SIZE = 16
+MAX_WAIT = 0.01
+
+
+class Job(object):
+
+    """A text waiting to be processed by the batcher."""
+
+    def __init__(self, finder):
+        self.finder = finder
+        self.error = None
+        self.done = threading.Event()
+
+
+class Batcher(threading.Thread):
+
+    """Thread that collects texts from concurrent requests and processes them in
+    batches. This is the only thread that uses spaCy."""
+
+    def __init__(self, classifier=True, batch_size=BATCH_SIZE, max_wait=MAX_WAIT):
+        super().__init__(daemon=True)
+        self.classifier = classifier
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.jobs = queue.Queue()
+
+    def submit(self, finder):
+        """Process the finder and wait for the result, returns the error if there
+        was one and None otherwise."""
+        job = Job(finder)
+        self.jobs.put(job)
+        job.done.wait()
+        return job.error
+
+    def run(self):
+        while True:
+            jobs = self._next_batch()
+            finders = ((job, job.finder) for job in jobs)
+            try:
+                for job, _, error in run_finders(finders, self.classifier,
+                                                 self.batch_size, write=False):
+                    job.error = error
+                    job.done.set()
+            except Exception as e:
+                # the batch failed as a whole, the jobs that are still waiting
+                # get the error so this thread can go on with the next batch
+                for job in jobs:
+                    if not job.done.is_set():
+                        job.error = e
+                        job.done.set()
+
+    def _next_batch(self):
+        """Wait for a job and then collect jobs until the batch is full or until
+        the first job waited long enough."""
+        jobs = [self.jobs.get()]
+        deadline = time.time() + self.max_wait
+        while len(jobs) < self.batch_size:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                jobs.append(self.jobs.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return jobs
+
+
+class Latencies(object):
+
+    """Keeps the most recent latencies for each endpoint."""
+
+    def __init__(self, size=10000):
+        self.size = size
+        self.latencies = {}
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def add(self, endpoint, seconds):
+        with self.lock:
+            if endpoint not in self.latencies:
+                self.latencies[endpoint] = deque(maxlen=self.size)
+            self.latencies[endpoint].append(seconds)
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+
+    def percentiles(self):
+        """Return the request count and latency percentiles in milliseconds for each
+        endpoint, the percentiles are over the most recent requests only."""
+        stats = {}
+        with self.lock:
+            for endpoint, latencies in self.latencies.items():
+                ordered = sorted(latencies)
+                stats[endpoint] = {"requests": self.counts[endpoint]}
+                for p in (50, 90, 99):
+                    i = min(len(ordered) - 1, int(len(ordered) * p / 100))
+                    stats[endpoint]["p%d" % p] = round(ordered[i] * 1000, 2)
+        return stats
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._respond(200, self.server.latencies.percentiles())
+        else:
+            self._respond(404, {"error": "unknown endpoint"})
+
+    def do_POST(self):
+        t0 = time.time()
+        if self.path == '/annotate':
+            status, response = self._annotate()
+        elif self.path == '/classify':
+            status, response = self._classify()
+        else:
+            self._respond(404, {"error": "unknown endpoint"})
+            return
+        self._respond(status, response)
+        self.server.latencies.add(self.path, time.time() - t0)
+
+    def _annotate(self):
+        try:
+            request = self._read_json()
+            if not isinstance(request, dict):
+                raise ValueError("request is not a JSON object")
+            if not isinstance(request.get('text'), str):
+                raise ValueError("request has no text")
+            finder = TechnologyFinder(None, None, text=request['text'])
+        except Exception as e:
+            return 400, {"error": str(e)}
+        error = self.server.batcher.submit(finder)
+        record = result_record(request.get('id'), finder, error,
+                               request.get('format', 'lif'))
+        return (200 if error is None else 500), record
+
+    def _classify(self):
+        try:
+            lif = LIF(json_object=self._read_json())
+        except Exception as e:
+            return 400, {"error": str(e)}
+        try:
+            Classifier().classify_lif(lif)
+        except Exception as e:
+            return 500, {"error": str(e)}
+        return 200, lif.as_json()
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length))
+
+    def _respond(self, status, response):
+        body = json.dumps(response).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # clients on a Unix socket do not have an address
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return 'local'
+
+
+class HTTPServer(ThreadingHTTPServer):
+
+    def __init__(self, address, batcher):
+        super().__init__(address, RequestHandler)
+        self.batcher = batcher
+        self.latencies = Latencies()
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, socket_file, batcher):
+        if os.path.exists(socket_file):
+            os.remove(socket_file)
+        super().__init__(socket_file, RequestHandler)
+        self.batcher = batcher
+        self.latencies = Latencies()
+
+
+def serve(port=None, socket_file=None, classifier=True,
+          batch_size=BATCH_SIZE, max_wait=MAX_WAIT):
+    """Load the models and serve requests until interrupted. The classifier model
+    is loaded even if the classifier is switched off for /annotate, since the
+    /classify endpoint needs it and loading it in a request thread would let
+    concurrent requests load it at the same time."""
+    main.load_spacy()
+    load_model(Classifier.DEFAULT_MODEL)
+    batcher = Batcher(classifier, batch_size, max_wait)
+    batcher.start()
+    if socket_file is not None:
+        server = UnixHTTPServer(socket_file, batcher)
+        print("Serving on %s" % socket_file)
+    else:
+        server = HTTPServer(('localhost', port), batcher)
+        print("Serving on http://localhost:%d" % port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_file is not None and os.path.exists(socket_file):
+            os.remove(socket_file)
+
+
+if __name__ == '__main__':
+
+    h_port = "The port on localhost to listen to (default is 8000)."
+    h_socket = "Listen to a Unix socket instead of a port."
+    h_classifier = "Switch off the classifier for the annotate endpoint."
+    h_batch_size = "The maximum number of texts parsed together" \
+        + " (default is %d)." % BATCH_SIZE
+    h_max_wait = "The maximum number of milliseconds a text waits for other" \
+        + " texts to join its batch (default is %d)." % (MAX_WAIT * 1000)
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", help=h_port, type=int, default=8000)
+    parser.add_argument("--socket", metavar='SOCKET_FILE', help=h_socket)
+    parser.add_argument("--classifier-off", dest='classifier',
+                        help=h_classifier, action="store_false")
+    parser.add_argument("--batch-size", help=h_batch_size, type=int, default=BATCH_SIZE)
+    parser.add_argument("--max-wait", help=h_max_wait, type=float,
+                        default=MAX_WAIT * 1000)
+    args = parser.parse_args()
+
+    serve(port=args.port, socket_file=args.socket, classifier=args.classifier,
+          batch_size=args.batch_size, max_wait=args.max_wait / 1000)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the code imports its modules relative to the code directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
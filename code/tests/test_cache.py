@@ -0,0 +1,51 @@
+import os
+
+from utils.cache import DocCache, SIZE_FILE, STALE_AGE
+
+
+def recorded_size(directory):
+    with open(os.path.join(directory, SIZE_FILE)) as fh:
+        return int(fh.read())
+
+
+def test_get_and_put(tmp_path):
+    cache = DocCache(str(tmp_path), 'v1')
+    assert cache.get('Jane Doe sleeps.') is None
+    cache.put('Jane Doe sleeps.', b'parsed')
+    assert cache.get('Jane Doe sleeps.') == b'parsed'
+    assert DocCache(str(tmp_path), 'v2').get('Jane Doe sleeps.') is None
+
+
+def test_size_of_replaced_entries_is_not_added(tmp_path):
+    cache = DocCache(str(tmp_path), 'v1')
+    cache.put('one', b'x' * 10)
+    cache.put('two', b'x' * 20)
+    cache.put('one', b'x' * 10)
+    assert recorded_size(str(tmp_path)) == 30
+
+
+def test_eviction(tmp_path):
+    cache = DocCache(str(tmp_path), 'v1', max_size=100)
+    for i in range(10):
+        cache.put('text %d' % i, b'x' * 30)
+        os.utime(cache.path(cache.key('text %d' % i)), ns=(i * 10 ** 9, i * 10 ** 9))
+    assert recorded_size(str(tmp_path)) <= 90
+    assert cache.get('text 9') is not None
+    assert cache.get('text 0') is None
+
+
+def test_stale_temporary_files_are_removed(tmp_path):
+    cache = DocCache(str(tmp_path), 'v1', max_size=100)
+    cache.put('text', b'x' * 10)
+    subdir = os.path.dirname(cache.path(cache.key('text')))
+    stale = os.path.join(subdir, 'tmpstale')
+    fresh = os.path.join(subdir, 'tmpfresh')
+    for fname in (stale, fresh):
+        with open(fname, 'wb') as fh:
+            fh.write(b'x' * 50)
+    old = os.path.getmtime(stale) - 2 * STALE_AGE
+    os.utime(stale, (old, old))
+    cache.evict(100)
+    assert not os.path.exists(stale)
+    assert os.path.exists(fresh)
+    assert cache.get('text') == b'x' * 10
@@ -0,0 +1,48 @@
+import pytest
+
+pytest.importorskip('spacy')
+
+from main import split_text, _chunk_end
+
+
+def test_short_text_is_one_chunk():
+    assert split_text('Jane Doe sleeps.', max_length=100) == ['Jane Doe sleeps.']
+
+
+def test_chunks_join_to_the_text():
+    text = ' '.join('word%d' % i for i in range(1000))
+    chunks = split_text(text, max_length=100)
+    assert ''.join(chunks) == text
+    assert all(len(chunk) <= 100 for chunk in chunks)
+
+
+def test_chunks_end_at_paragraphs():
+    paragraph = 'A thermometer measures temperature. ' * 2
+    text = '\n\n'.join([paragraph] * 10)
+    chunks = split_text(text, max_length=200)
+    assert ''.join(chunks) == text
+    assert all(chunk.endswith('\n\n') for chunk in chunks[:-1])
+
+
+def test_chunks_end_after_a_period():
+    text = 'A thermometer measures temperature. ' * 20
+    chunks = split_text(text, max_length=100)
+    assert ''.join(chunks) == text
+    assert all(chunk.endswith('. ') for chunk in chunks[:-1])
+
+
+def test_sentence_end_before_line_break():
+    text = 'A thermometer measures\ntemperature. ' + 'x' * 10
+    assert _chunk_end(text, 0, 40) == len('A thermometer measures\ntemperature. ')
+
+
+def test_no_cut_inside_a_token():
+    text = 'x' * 30 + ' ' + 'y' * 30 + ' z'
+    assert _chunk_end(text, 0, 50) == 31
+    assert split_text(text, max_length=50) == ['x' * 30 + ' ', 'y' * 30 + ' z']
+
+
+def test_long_token_is_not_cut():
+    text = 'x' * 250 + ' y'
+    assert split_text(text, max_length=100) == ['x' * 250 + ' ', 'y']
+    assert split_text('x' * 250, max_length=100) == ['x' * 250]
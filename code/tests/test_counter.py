@@ -0,0 +1,66 @@
+import utils.counter as counter_module
+from utils.counter import SpillingCounter
+
+
+def test_counts_in_memory(tmp_path):
+    counter = SpillingCounter(str(tmp_path))
+    for term in ['b', 'a', 'b']:
+        counter.add(term)
+    assert list(counter.items()) == [('a', 1), ('b', 2)]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_counts_are_added_across_runs(tmp_path):
+    counter = SpillingCounter(str(tmp_path), max_terms=2)
+    for term in ['a', 'b', 'c', 'a', 'd', 'e', 'a', 'c']:
+        counter.add(term)
+    assert len(counter.runs) > 1
+    assert list(counter.items()) == [('a', 3), ('b', 1), ('c', 2), ('d', 1), ('e', 1)]
+
+
+def test_items_by_count(tmp_path):
+    counter = SpillingCounter(str(tmp_path), max_terms=2)
+    for term in ['x', 'y', 'z', 'y', 'z', 'w']:
+        counter.add(term)
+    assert list(counter.items_by_count()) == [('y', 2), ('z', 2), ('w', 1), ('x', 1)]
+
+
+def test_merging_runs_of_other_counters(tmp_path):
+    runs = []
+    for terms in (['heat', 'sensor'], ['sensor', 'laser'], ['laser', 'sensor']):
+        counter = SpillingCounter(str(tmp_path))
+        for term in terms:
+            counter.add(term)
+        runs.extend(counter.spill())
+    merged = SpillingCounter(str(tmp_path))
+    merged.add_runs(runs)
+    merged.add('heat', 2)
+    assert list(merged.items()) == [('heat', 3), ('laser', 2), ('sensor', 3)]
+
+
+def test_terms_with_spaces_and_unicode(tmp_path):
+    counter = SpillingCounter(str(tmp_path), max_terms=1)
+    for term in ['café au lait', 'naïve bayes', 'café au lait']:
+        counter.add(term)
+    assert dict(counter.items()) == {'café au lait': 2, 'naïve bayes': 1}
+
+
+def test_terms_with_carriage_returns(tmp_path):
+    counter = SpillingCounter(str(tmp_path), max_terms=1)
+    for term in ['a\rb', 'c', 'a\rb']:
+        counter.add(term)
+    assert list(counter.items()) == [('a\rb', 2), ('c', 1)]
+
+
+def test_runs_are_merged_in_groups(tmp_path, monkeypatch):
+    monkeypatch.setattr(counter_module, 'MAX_OPEN_RUNS', 3)
+    counter = SpillingCounter(str(tmp_path), max_terms=1)
+    terms = ['t%02d' % (i % 7) for i in range(20)]
+    for term in terms:
+        counter.add(term)
+    assert len(counter.runs) > 3
+    expected = sorted((term, terms.count(term)) for term in set(terms))
+    assert list(counter.items()) == expected
+    assert len(counter.runs) <= 3
+    by_count = sorted(expected, key=lambda pair: (-pair[1], pair[0]))
+    assert list(counter.items_by_count()) == by_count
@@ -0,0 +1,26 @@
+from utils.features import vector_string, parse_vector
+
+
+def test_round_trip():
+    feats = {'sentence_loc': 3, 'plen': 2, 'first_word': 'digital',
+             'last_word': 'thermometer'}
+    assert parse_vector(vector_string(feats)) == feats
+
+
+def test_none_values_come_back_as_strings():
+    # the vector string has no type for missing values
+    assert parse_vector(vector_string({'prev_J': None})) == {'prev_J': 'None'}
+
+
+def test_values_with_spaces():
+    feats = {'first_word': 'New York', 'tag_list': 'NNP_NNP', 'plen': 2}
+    assert parse_vector(vector_string(feats)) == feats
+
+
+def test_integer_features():
+    feats = parse_vector('sentence_loc=7 plen=x suffix3=ter')
+    assert feats == {'sentence_loc': 7, 'plen': 'x', 'suffix3': 'ter'}
+
+
+def test_empty_vector():
+    assert parse_vector('') == {}
@@ -0,0 +1,63 @@
+import os
+
+from utils.manifest import Manifest, MANIFEST_FILE
+
+
+def _files(tmp_path, text='A thermometer measures temperature.'):
+    infile = tmp_path / 'doc.txt'
+    infile.write_text(text)
+    outdir = tmp_path / 'out'
+    outdir.mkdir()
+    outfile = outdir / 'doc.lif'
+    outfile.write_text('{}')
+    return str(infile), str(outdir), str(outfile)
+
+
+def test_current_after_add(tmp_path):
+    infile, outdir, outfile = _files(tmp_path)
+    with Manifest(outdir) as manifest:
+        assert not manifest.is_current(infile, outfile, 'v1')
+        manifest.add(infile, outfile, 'v1')
+        assert manifest.is_current(infile, outfile, 'v1')
+    with Manifest(outdir) as manifest:
+        assert manifest.is_current(infile, outfile, 'v1')
+        assert not manifest.is_current(infile, outfile, 'v2')
+
+
+def test_stale_when_content_changes(tmp_path):
+    infile, outdir, outfile = _files(tmp_path)
+    with Manifest(outdir) as manifest:
+        manifest.add(infile, outfile, 'v1')
+    with open(infile, 'a') as fh:
+        fh.write(' And a laser.')
+    with Manifest(outdir) as manifest:
+        assert not manifest.is_current(infile, outfile, 'v1')
+
+
+def test_stale_when_output_is_missing(tmp_path):
+    infile, outdir, outfile = _files(tmp_path)
+    with Manifest(outdir) as manifest:
+        manifest.add(infile, outfile, 'v1')
+    os.remove(outfile)
+    with Manifest(outdir) as manifest:
+        assert not manifest.is_current(infile, outfile, 'v1')
+
+
+def test_incomplete_last_line_is_ignored(tmp_path):
+    infile, outdir, outfile = _files(tmp_path)
+    with Manifest(outdir) as manifest:
+        manifest.add(infile, outfile, 'v1')
+    with open(os.path.join(outdir, MANIFEST_FILE), 'a') as fh:
+        fh.write('{"input": "oth')
+    with Manifest(outdir) as manifest:
+        assert manifest.is_current(infile, outfile, 'v1')
+
+
+def test_records_after_an_incomplete_line(tmp_path):
+    infile, outdir, outfile = _files(tmp_path)
+    with open(os.path.join(outdir, MANIFEST_FILE), 'w') as fh:
+        fh.write('{"input": "oth')
+    with Manifest(outdir) as manifest:
+        manifest.add(infile, outfile, 'v1')
+    with Manifest(outdir) as manifest:
+        assert manifest.is_current(infile, outfile, 'v1')
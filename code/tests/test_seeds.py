@@ -0,0 +1,80 @@
+import os
+
+from utils.seeds import SeedIndex, normalize
+
+
+def seed_index():
+    return SeedIndex([('thermometer', 'y'),
+                      ('digital thermometer', 'y'),
+                      ('temperature', 'n'),
+                      ('the sensor', 'y'),
+                      ('sensor', 'n'),
+                      ('laser', 'y'),
+                      ('laser beam', 'y'),
+                      ('beam', 'n')])
+
+
+def test_normalize():
+    assert normalize('The  Digital Thermometer,') == ('digital', 'thermometer')
+    assert normalize('its laser') == ('laser',)
+    assert normalize('"the"') == ()
+
+
+def test_exact():
+    seeds = seed_index()
+    assert seeds.label('Thermometer') == 'y'
+    assert seeds.label('the temperature.') == 'n'
+    assert seeds.label('infrared thermometer') is None
+
+
+def test_conflicting_seeds():
+    seeds = seed_index()
+    assert seeds.label('sensor') == '?'
+
+
+def test_head():
+    seeds = seed_index()
+    assert seeds.label('infrared thermometer', match='head') == 'y'
+    assert seeds.label('cheap digital thermometer', match='head') == 'y'
+    assert seeds.label('thermometer reading', match='head') is None
+    assert seeds.label('room temperature', match='head') == 'n'
+
+
+def test_substring():
+    seeds = seed_index()
+    assert seeds.label('thermometer reading', match='substring') == 'y'
+    assert seeds.label('pulsed laser beam splitter', match='substring') == 'y'
+    assert seeds.label('magnetic field', match='substring') is None
+
+
+def test_longest_match_that_disagrees():
+    seeds = SeedIndex([('laser', 'y'), ('beam', 'n')])
+    assert seeds.label('laser beam', match='substring') == '?'
+    assert seeds.label('laser beam', match='head') == 'n'
+
+
+def test_load_saves_and_reuses_the_index(tmp_path):
+    (tmp_path / 'tech-test.txt').write_text('thermometer\nlaser\n')
+    (tmp_path / 'labels-test.txt').write_text('n\t12\ttemperature\n')
+    seeds = SeedIndex.load(str(tmp_path))
+    assert len(seeds) == 3
+    assert (tmp_path / 'seeds-index.pickle').exists()
+    assert SeedIndex.load(str(tmp_path)).label('The laser') == 'y'
+    (tmp_path / 'tech-test.txt').write_text('thermometer\nlaser\nsensor\n')
+    assert SeedIndex.load(str(tmp_path)).label('sensor') == 'y'
+
+
+def test_unreadable_index_is_built_again(tmp_path):
+    (tmp_path / 'tech-test.txt').write_text('thermometer\n')
+    (tmp_path / 'seeds-index.pickle').write_bytes(b'\x80\x05 truncated')
+    assert SeedIndex.load(str(tmp_path)).label('thermometer') == 'y'
+    assert SeedIndex.load(str(tmp_path)).label('thermometer') == 'y'
+
+
+def test_saved_index_has_the_usual_permissions(tmp_path):
+    umask = os.umask(0o022)
+    try:
+        SeedIndex([('laser', 'y')]).save(str(tmp_path / 'seeds-index.pickle'))
+    finally:
+        os.umask(umask)
+    assert (tmp_path / 'seeds-index.pickle').stat().st_mode & 0o777 == 0o644
@@ -0,0 +1,113 @@
+import types
+from array import array
+
+import utils.store
+from utils.lif import LIF
+from utils.store import write_lif, load_lif, is_store_file
+
+
+def lif_object():
+    text = "Jane Doe sleeps."
+    return {
+        "@context": "http://vocab.lappsgrid.org/context-1.0.0.jsonld",
+        "metadata": {},
+        "text": {"@value": text, "language": "en"},
+        "views": [
+            {"id": "tokens", "metadata": {},
+             "annotations": [
+                 {"id": "s1", "@type": "http://vocab.lappsgrid.org/Sentence",
+                  "start": 0, "end": 16, "features": {}},
+                 {"id": "t1", "@type": "http://vocab.lappsgrid.org/Token",
+                  "start": 0, "end": 4, "features": {"word": "Jane", "pos": "NNP"}},
+                 {"id": "t2", "@type": "http://vocab.lappsgrid.org/Token",
+                  "start": 5, "end": 8, "features": {"word": "Doe", "pos": "NNP"}},
+                 {"id": "t3", "@type": "http://vocab.lappsgrid.org/Token",
+                  "start": 9, "end": 15, "features": {"word": "sleeps", "pos": "VBZ"}},
+                 {"id": "t4", "@type": "http://vocab.lappsgrid.org/Token",
+                  "start": 15, "end": 16, "features": {"word": ".", "pos": "."}}]},
+            {"id": "dependencies", "metadata": {},
+             "annotations": [
+                 {"id": "depstruct1",
+                  "@type": "http://vocab.lappsgrid.org/DependencyStructure",
+                  "features": {"dependencies": ["dep1", "dep2"]}},
+                 {"id": "dep1", "@type": "http://vocab.lappsgrid.org/Dependency",
+                  "features": {"label": "nsubj", "governor": "tokens:t3",
+                               "dependent": "tokens:t2", "text": "sleeps -> Doe"}},
+                 {"id": "dep2", "@type": "http://vocab.lappsgrid.org/Dependency",
+                  "features": {"label": "ROOT", "governor": None,
+                               "dependent": "tokens:t3", "text": "sleeps -> sleeps"}}]},
+            {"id": "terms", "metadata": {},
+             "annotations": [
+                 {"id": "term1", "@type": "http://vocab.lappsgrid.org/Term",
+                  "start": 0, "end": 8,
+                  "features": {"text": "Jane Doe",
+                               "vector": "sentence_loc=0 plen=2 first_word=Jane"}}]}]}
+
+
+def test_is_store_file():
+    assert is_store_file('out/doc.lifs')
+    assert not is_store_file('out/doc.lif')
+    assert not is_store_file('out/doc.lif.gz')
+
+
+def test_round_trip(tmp_path):
+    fname = str(tmp_path / 'doc.lifs')
+    lif = LIF(json_object=lif_object())
+    write_lif(lif, fname)
+    assert load_lif(fname).as_json() == lif.as_json()
+
+
+def test_load_some_views(tmp_path):
+    fname = str(tmp_path / 'doc.lifs')
+    write_lif(LIF(json_object=lif_object()), fname)
+    lif = load_lif(fname, views=['terms'])
+    assert [view.id for view in lif.views] == ['terms']
+    assert lif.text.value == "Jane Doe sleeps."
+    term = lif.get_view('terms').annotations[0]
+    assert term.get_text() == 'Jane Doe'
+
+
+def test_load_without_text(tmp_path):
+    fname = str(tmp_path / 'doc.lifs')
+    write_lif(LIF(json_object=lif_object()), fname)
+    lif = load_lif(fname, views=['terms'], text=False)
+    assert not lif.text.value
+    term = lif.get_view('terms').annotations[0]
+    assert term.get_text() == 'Jane Doe'
+    assert term.features['vector'] == "sentence_loc=0 plen=2 first_word=Jane"
+
+
+class SwappedArray(array):
+
+    """An array that is written with its bytes swapped."""
+
+    def tobytes(self):
+        swapped = array(self.typecode, self)
+        swapped.byteswap()
+        return swapped.tobytes()
+
+
+def test_other_byte_order(tmp_path, monkeypatch):
+    fname = str(tmp_path / 'doc.lifs')
+    json_object = lif_object()
+    json_object['views'][2]['annotations'][0]['features']['length'] = 70000
+    lif = LIF(json_object=json_object)
+    other = 'big' if utils.store.sys.byteorder == 'little' else 'little'
+    with monkeypatch.context() as m:
+        m.setattr(utils.store, 'array', SwappedArray)
+        m.setattr(utils.store, 'sys', types.SimpleNamespace(byteorder=other))
+        write_lif(lif, fname)
+    assert load_lif(fname).as_json() == lif.as_json()
+
+
+def test_large_numbers(tmp_path):
+    fname = str(tmp_path / 'doc.lifs')
+    json_object = lif_object()
+    term = json_object['views'][2]['annotations'][0]
+    term['start'], term['end'] = 3000000000, 3000000008
+    term['features']['hash'] = 2 ** 64
+    term['features']['count'] = -2 ** 63
+    lif = LIF(json_object=json_object)
+    write_lif(lif, fname)
+    assert load_lif(fname, views=['terms'], text=False).as_json()['views'] \
+        == lif.as_json()['views'][2:]
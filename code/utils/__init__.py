@@ -3,6 +3,15 @@ import sys
 import time
 import gzip
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# extensions of compressed files that can be read and written
+COMPRESSION_EXTENSIONS = {'gz': '.gz', 'zst': '.zst'}
+
 
 def timer(fun):
    def wrapper(*args):
@@ -39,17 +48,45 @@ def read_file(fname):
     return open_file(fname).read()
 
 
-def open_file(fname, mode='r'):
-    """Open a file the normal way or using gzip, choice depends on whether the file
-    extension is .gz or not. The only modes this deals with are 'r' and 'w' and
-    it always assumes text data and not binary."""
-    if mode == 'r':
-        if fname.endswith('.gz'):
-            return gzip.open(fname, 'rt')
-        else:
-            return open(fname, mode)
-    elif mode == 'w':
-        if fname.endswith('.gz'):
-            return gzip.open(fname, 'wt')
-        else:
-            return open(fname, mode)
+def open_file(fname, mode='r', encoding=None):
+    """Open a file the normal way or using gzip or zstandard, choice depends on
+    whether the file extension is .gz, .zst or something else. The only modes
+    this deals with are 'r' and 'w' and it always assumes text data and not
+    binary, in the given encoding or the default encoding if there is none.
+    Compressed files are compressed while they are written."""
+    if mode not in ('r', 'w'):
+        return None
+    if fname.endswith('.gz'):
+        # level 6 is the zlib default, it is much faster than gzip's default of 9
+        # and the files are only slightly bigger
+        return gzip.open(fname, mode + 't', compresslevel=6, encoding=encoding)
+    elif fname.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError("the zstandard package is needed for %s" % fname)
+        return zstandard.open(fname, mode + 't', encoding=encoding)
+    else:
+        return open(fname, mode, encoding=encoding)
+
+
+def can_compress(compress):
+    """Return True if files can be written with the compression method."""
+    return compress != 'zst' or zstandard is not None
+
+
+def compressed_file_name(fname, compress=None):
+    """Add the extension for the compression method ('gz' or 'zst') to the file name,
+    unless the name already has it. Returns the name unchanged if compress is
+    None."""
+    if compress is None:
+        return fname
+    extension = COMPRESSION_EXTENSIONS[compress]
+    return fname if fname.endswith(extension) else fname + extension
+
+
+def lif_file_name(fname, compress=None, lif_extension='.lif'):
+    """Return the name of the LIF file for a text file, replacing the .txt extension
+    with .lif, or adding .lif if there is no .txt extension. Another extension can
+    be used for other output formats."""
+    base, extension = os.path.splitext(fname)
+    lif_name = base + lif_extension if extension == '.txt' else fname + lif_extension
+    return compressed_file_name(lif_name, compress)
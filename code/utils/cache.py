@@ -0,0 +1,161 @@
+"""cache.py
+
+An on-disk cache for serialized spaCy analyses, addressed by the content of the
+text that was analysed.
+
+Entries are stored as files in a directory, where the name of a file is the
+SHA-1 hash of a version string and the text, so a text that occurs in many
+documents is only parsed once and entries made with another model are never
+used. The first two characters of the hash are used as a subdirectory to keep
+directories small.
+
+The cache is bounded in size. The modification time of an entry is updated
+when it is used and when the cache grows beyond its maximum size the least
+recently used entries are removed until the cache is at 90% of its maximum.
+Entries are written to a temporary file which is then renamed, so several
+processes can share a cache directory. The size of the cache is kept in a file in
+the cache directory that is locked while it is updated, so all processes that
+share the cache see the writes of the others and the maximum size holds for the
+cache as a whole.
+
+>>> cache = DocCache('data/cache', 'en_core_web_sm-3.7.1', max_size=1 << 30)
+>>> data = cache.get(text)
+>>> if data is None:
+...     cache.put(text, analyse(text))
+
+"""
+
+import os
+import time
+import fcntl
+import hashlib
+import tempfile
+
+
+# Default maximum size of the cache in bytes
+MAX_SIZE = 1 << 30
+
+# Entries end in this extension, temporary files do not
+ENTRY_EXTENSION = '.bin'
+
+# File in the cache directory with the total size of the entries
+SIZE_FILE = 'size'
+
+# Temporary files older than this many seconds were left behind by a process
+# that died while writing an entry, they are removed when entries are evicted
+STALE_AGE = 3600
+
+
+class DocCache(object):
+
+    def __init__(self, directory, version, max_size=MAX_SIZE):
+        self.directory = directory
+        self.version = version
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def __str__(self):
+        return "<DocCache %s hits=%d misses=%d>" % (self.directory, self.hits, self.misses)
+
+    def key(self, text):
+        sha1 = hashlib.sha1(self.version.encode('utf8'))
+        sha1.update(b'\0')
+        sha1.update(text.encode('utf8', 'surrogatepass'))
+        return sha1.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ENTRY_EXTENSION)
+
+    def get(self, text):
+        """Return the bytes stored for the text or None if there are none."""
+        path = self.path(self.key(text))
+        try:
+            with open(path, 'rb') as fh:
+                data = fh.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # also when another process evicted the entry after it was read
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, text, data):
+        """Store the bytes for the text and evict entries if the cache is full."""
+        path = self.path(self.key(text))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with open(fd, 'wb') as fh:
+            fh.write(data)
+        with self._size_file() as fh:
+            # another process may have stored the same text in the meantime, the
+            # size of the entry it wrote was already added
+            try:
+                replaced_size = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced_size = 0
+            os.replace(tmp_path, path)
+            recorded = fh.read()
+            if recorded:
+                size = int(recorded) + len(data) - replaced_size
+            else:
+                # the size is computed from the entries for a new cache
+                size = sum(entry[1] for entry in self._entries())
+            if size > self.max_size:
+                size = self.evict(int(self.max_size * 0.9))
+            fh.seek(0)
+            fh.truncate()
+            fh.write(str(size))
+
+    def evict(self, target_size):
+        """Remove the least recently used entries until the cache is no larger than
+        target_size bytes and return the size of the cache. Temporary files that
+        were left behind are removed too."""
+        self._remove_stale_files()
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        size = sum(size for _, size, _ in entries)
+        for path, entry_size, _ in entries:
+            if size <= target_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+        return size
+
+    def _size_file(self):
+        """Open the size file and lock it, the lock is released when the file is
+        closed."""
+        fh = open(os.path.join(self.directory, SIZE_FILE), 'a+')
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        fh.seek(0)
+        return fh
+
+    def _entries(self, temporary=False):
+        """Generate the path, size and modification time of all entries, or of all
+        temporary files if temporary is True."""
+        if not os.path.isdir(self.directory):
+            return
+        for subdir in os.scandir(self.directory):
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir.path):
+                if entry.name.endswith(ENTRY_EXTENSION) != temporary:
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield entry.path, stat.st_size, stat.st_mtime_ns
+
+    def _remove_stale_files(self):
+        """Remove the temporary files that were not written to for STALE_AGE
+        seconds, younger ones may still be written by another process."""
+        limit = time.time_ns() - STALE_AGE * 10 ** 9
+        for path, _, mtime in self._entries(temporary=True):
+            if mtime < limit:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
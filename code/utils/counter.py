@@ -0,0 +1,129 @@
+"""counter.py
+
+A term counter that spills to disk when it gets too large, and that can merge
+counts written by other counters.
+
+When the number of distinct terms in memory exceeds max_terms the counts are
+sorted and written to a run file in the temporary directory and the in-memory
+table is emptied. Reading the counts merges all runs, so memory use depends on
+max_terms and not on the number of distinct terms. At most MAX_OPEN_RUNS runs are
+merged at once, when there are more they are first merged in groups into new
+runs, which replace the runs they were made from.
+
+>>> counter = SpillingCounter(tmpdir, max_terms=1000000)
+>>> counter.add('thermometer')
+>>> runs = counter.spill()
+>>> merged = SpillingCounter(tmpdir)
+>>> merged.add_runs(runs)
+>>> for term, count in merged.items():
+...     print(term, count)
+
+Terms should not contain newlines. Run files handed to add_runs() are owned by
+the counter from then on and may be removed when runs are merged.
+
+"""
+
+import os
+import heapq
+import tempfile
+from itertools import groupby, islice
+from operator import itemgetter
+
+
+MAX_TERMS = 1000000
+
+# Maximum number of run files that are open at the same time when merging, this
+# stays well below the usual limit of 1024 open files per process
+MAX_OPEN_RUNS = 100
+
+
+class SpillingCounter(object):
+
+    def __init__(self, tmpdir, max_terms=MAX_TERMS):
+        self.tmpdir = tmpdir
+        self.max_terms = max_terms
+        self.counts = {}
+        self.runs = []
+
+    def add(self, term, count=1):
+        self.counts[term] = self.counts.get(term, 0) + count
+        if len(self.counts) > self.max_terms:
+            self.spill()
+
+    def add_runs(self, runs):
+        """Add run files written by other counters."""
+        self.runs.extend(runs)
+
+    def spill(self):
+        """Write the in-memory counts to a new run file and return the list of all
+        run files of this counter."""
+        if self.counts:
+            self.runs.append(_write_run(sorted(self.counts.items()), self.tmpdir))
+            self.counts = {}
+        return self.runs
+
+    def items(self):
+        """Generate all <term, count> pairs ordered on the term, with the counts of
+        a term in different runs added up."""
+        self.runs = _merge_runs(self.runs, itemgetter(0), self.tmpdir, _add_counts)
+        streams = [_read_run(run) for run in self.runs]
+        streams.append(iter(sorted(self.counts.items())))
+        return _add_counts(heapq.merge(*streams, key=itemgetter(0)))
+
+    def items_by_count(self):
+        """Generate all <term, count> pairs ordered on decreasing count, terms with
+        the same count are ordered alphabetically. Sorting is done in chunks of
+        max_terms pairs which are written to disk and merged."""
+        key = lambda pair: (-pair[1], pair[0])
+        items = self.items()
+        runs = []
+        while True:
+            chunk = list(islice(items, self.max_terms))
+            if not chunk:
+                break
+            runs.append(_write_run(sorted(chunk, key=key), self.tmpdir))
+        runs = _merge_runs(runs, key, self.tmpdir)
+        try:
+            for pair in heapq.merge(*[_read_run(run) for run in runs], key=key):
+                yield pair
+        finally:
+            for run in runs:
+                os.remove(run)
+
+
+def _add_counts(pairs):
+    """Add up the counts of consecutive pairs with the same term."""
+    for term, group in groupby(pairs, key=itemgetter(0)):
+        yield term, sum(count for _, count in group)
+
+
+def _merge_runs(runs, key, tmpdir, combine=None):
+    """Merge groups of runs ordered on key into new runs until there are no more
+    than MAX_OPEN_RUNS of them and return the new list of runs. Merged pairs are
+    handed to combine if it is given. The runs that were merged are removed."""
+    runs = list(runs)
+    while len(runs) > MAX_OPEN_RUNS:
+        group = runs[:MAX_OPEN_RUNS]
+        merged = heapq.merge(*[_read_run(run) for run in group], key=key)
+        if combine is not None:
+            merged = combine(merged)
+        runs = runs[MAX_OPEN_RUNS:] + [_write_run(merged, tmpdir)]
+        for run in group:
+            os.remove(run)
+    return runs
+
+
+def _write_run(pairs, tmpdir):
+    # newline='\n' so that terms with other line breaks survive the round trip
+    fd, fname = tempfile.mkstemp(prefix='run-', suffix='.txt', dir=tmpdir)
+    with open(fd, 'w', encoding='utf8', newline='\n') as fh:
+        for term, count in pairs:
+            fh.write("%s\t%d\n" % (term, count))
+    return fname
+
+
+def _read_run(fname):
+    with open(fname, encoding='utf8', newline='\n') as fh:
+        for line in fh:
+            term, count = line[:-1].rsplit('\t', 1)
+            yield term, int(count)
@@ -1,3 +1,5 @@
+import sys
+
 from utils.lif import Annotation
 
 
@@ -8,58 +10,59 @@ def vocab(short_form):
 
 class AnnotationFactory(object):
 
-    @classmethod
-    def reset(cls):
-        Identifier.reset()
+    """Creates LIF annotations for one document. Each factory has its own identifier
+    context so that identifiers are deterministic for a document no matter how
+    many other documents are being annotated at the same time."""
+
+    def __init__(self, identifier=None):
+        self.identifier = Identifier() if identifier is None else identifier
+
+    def reset(self):
+        self.identifier.reset()
 
-    @classmethod
-    def sentence_annotation(cls, sent, doc):
+    def sentence_annotation(self, sent, doc):
         w1 = doc[sent.start]
         w2 = doc[sent.end - 1]
         p1 = w1.idx
         p2 = w2.idx + len(w2)
         return Annotation(
-            {"id": Identifier.new('s'),
+            {"id": self.identifier.new('s'),
              "@type": vocab('Sentence'),
              'start': p1,
              'end': p2})
 
-    @classmethod
-    def token_annotation(cls, token):
+    def token_annotation(self, token):
         anno = Annotation(
-            {"id": Identifier.new('t'),
+            {"id": self.identifier.new('t'),
              "@type": vocab('Token'),
              'start': token.idx,
              'end': token.idx + len(token.text),
              'features': {
                  'word': token.text,
-                 'pos': token.tag_}})
+                 'pos': sys.intern(token.tag_)}})
         anno.text = anno.features['word']
         return anno
 
-    @classmethod
-    def dependency_structure_annotation(cls, dependencies):
+    def dependency_structure_annotation(self, dependencies):
         return Annotation(
-            {"id": Identifier.new('depstruct'),
+            {"id": self.identifier.new('depstruct'),
              "@type": vocab('DependencyStructure'),
              'features': {
                  'dependencies': [dep.id for dep in dependencies] }})
 
-    @classmethod
-    def dependency_annotation(cls, token, idx2id):
+    def dependency_annotation(self, token, idx2id):
         return Annotation(
-            {"id": Identifier.new('dep'),
+            {"id": self.identifier.new('dep'),
              "@type": vocab('Dependency'),
              'features': {
-                 'label': token.dep_,
+                 'label': sys.intern(token.dep_),
                  'governor': idx2id.get(token.head.i),
                  'dependent': idx2id.get(token.i),
                  'text': "%s -> %s" % (token.head.text, token.text)}})
 
-    @classmethod
-    def term_annotation(cls, noun_chunk):
+    def term_annotation(self, noun_chunk):
         anno = Annotation(
-            {"id": Identifier.new('term'),
+            {"id": self.identifier.new('term'),
              "@type": vocab('Term'),
              "start": noun_chunk.start_char,
              "end": noun_chunk.end_char,
@@ -68,11 +71,10 @@ class AnnotationFactory(object):
         anno.text = noun_chunk.text
         return anno
 
-    @classmethod
-    def technology_annotation(cls, term_annotation):
+    def technology_annotation(self, term_annotation):
         text = term_annotation.features.get('text')
         anno = Annotation(
-            {"id": Identifier.new('tech'),
+            {"id": self.identifier.new('tech'),
              "@type": vocab('Technology'),
              "start": term_annotation.start,
              "end": term_annotation.end,
@@ -85,15 +87,14 @@ class AnnotationFactory(object):
 
 class Identifier(object):
 
-    """Class to keep track of what identifiers have been used."""
+    """Class to keep track of what identifiers have been used in a document."""
 
-    COUNTS = {}
+    def __init__(self):
+        self.counts = {}
 
-    @classmethod
-    def reset(cls):
-        cls.COUNTS = {}
+    def reset(self):
+        self.counts = {}
 
-    @classmethod
-    def new(cls, prefix):
-        cls.COUNTS[prefix] = cls.COUNTS.get(prefix, 0) + 1
-        return "%s%s" % (prefix, cls.COUNTS[prefix])
+    def new(self, prefix):
+        self.counts[prefix] = self.counts.get(prefix, 0) + 1
+        return "%s%s" % (prefix, self.counts[prefix])
@@ -40,8 +40,24 @@ Notes:
   more than, due to, different from, suitable for, equal to, dependent on,
   useful for, etcetera; probably following back prep->pobj dependencies
 
+Features are stored on the term annotation in two ways. The vector instance
+variable has a dictionary with the atomic feature values, which is what the
+classifier and the trainer use, and the vector feature has the same features as
+a string of space-separated feat=val pairs, which is what ends up in the LIF
+output and in feature files. That string can be turned back into a dictionary
+with parse_vector().
+
 """
 
+import re
+
+
+# features with integer values, restored as integers when parsing a vector string
+INTEGER_FEATURES = ('sentence_loc', 'plen')
+
+# a feature name in a vector string, values run until the next feature name
+FEATURE_NAME = re.compile(r'(?:^| )([^\s=]+)=')
+
 
 def add_term_features(graph, verbose=False):
     """Pull features from the graph and add them as vectors to the terms. All
@@ -57,7 +73,8 @@ def add_term_features(graph, verbose=False):
             print()
         feats = extract_term_features(graph, term)
         atomify_features(feats)
-        vector = ' '.join(["%s=%s" % (k, v) for k, v in feats.items()])
+        vector = vector_string(feats)
+        term.annotation.vector = feats
         term.annotation.features['vector'] = vector
         if verbose:
             print(vector)
@@ -93,6 +110,46 @@ def atomify_features(features):
             features[feat] = '_'.join([str(e) for e in val])
 
 
+def vector_string(feats):
+    """Return the features as a string of space-separated feat=val pairs."""
+    return ' '.join(["%s=%s" % (k, v) for k, v in feats.items()])
+
+
+def parse_vector(vector):
+    """Turn a string created by vector_string() back into a dictionary. Values may
+    contain spaces and integer features get their integer values back."""
+    feats = {}
+    matches = list(FEATURE_NAME.finditer(vector))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(vector)
+        feat = match.group(1)
+        val = vector[match.end():end]
+        if feat in INTEGER_FEATURES:
+            try:
+                val = int(val)
+            except ValueError:
+                pass
+        feats[feat] = val
+    return feats
+
+
+def term_features(annotation):
+    """Return the feature dictionary of a term annotation, parsing it from the vector
+    string if the term was read from a LIF file. Returns None if the term has no
+    features."""
+    if annotation.vector is not None:
+        return annotation.vector
+    vector = annotation.features.get('vector')
+    return None if vector is None else parse_vector(vector)
+
+
+def vectorizer_input(feats):
+    """Return the dictionary that is handed to the vectorizer. Models are trained
+    on string values only, so integer features are treated as categories, just
+    like all other features."""
+    return {feat: str(val) for feat, val in feats.items()}
+
+
 def print_features(feats):
     for feat, val in feats.items():
         print("  %s=%s" % (feat, val))
@@ -166,6 +223,9 @@ def add_dependencies(term, features):
     """Add dependency information for the term. Now only adds the governor of the
     head of the term."""
     head_token = term.tokens[-1]
+    if head_token.governor is None:
+        # there is no governor if the document was not parsed
+        return
     label, governor = head_token.governor
     features["dep_%s" % label] = governor.annotation.text
 
@@ -5,6 +5,10 @@ certain pieces of information needed for the ML features easily accessable. For
 example, it should be easy to find the next three tokens, or the governing
 token, or the part-of-speech or the last word of a term.
 
+A graph can be created from a LIF object with create_graph() or, when the spaCy
+analysis is still available, with create_graph_from_doc(), which is faster since
+it gets all links from token indexes in the spaCy document.
+
 Characteristics of the graph:
 
 - It contains three kinds of nodes: token nodes, term nodes and sentence nodes.
@@ -26,8 +30,15 @@ Characteristics of the graph:
   parse) as well as a list of links to dependents. The links contain both the
   label of the dependency and the target token.
 
+Tokens and terms are assumed to be added in document order, which is how they
+appear in the views created by main.py. The graph keeps sorted lists of their
+start offsets so that range lookups can use binary search.
+
 """
 
+from bisect import bisect_left
+
+
 def create_graph(lif_object):
     """Create a graph from a LIF object."""
     pos_view = lif_object.get_view('tokens')
@@ -40,6 +51,47 @@ def create_graph(lif_object):
     return graph
 
 
+def create_graph_from_doc(doc, sentences, tokens, terms,
+                          pos_view_id='tokens', term_view_id='terms', dependencies=True):
+    """Create a graph straight from a spaCy document and the LIF annotations that
+    were created for it. The sentences and terms arguments are lists of pairs of
+    a spaCy span and its annotation and tokens is a list of token annotations
+    indexed on the token position in the document. All links are taken from
+    token indexes in the document so there is no need to resolve identifiers or
+    to search for nodes in an offset range. Governors and dependents are only
+    added if dependencies is True, which requires that the document was parsed."""
+    graph = Graph()
+    for anno in tokens:
+        graph.add_token(TokenNode(pos_view_id, anno))
+    for span, anno in sentences:
+        sentence_node = SentenceNode(pos_view_id, anno)
+        graph.add_sentence(sentence_node)
+        for pos, token_node in enumerate(graph.tokens[span.start:span.end]):
+            sentence_node.tokens.append(token_node)
+            token_node.sentence = sentence_node
+            token_node.sentence_position = pos
+    for span, anno in terms:
+        term_node = TermNode(term_view_id, anno)
+        graph.add_term(term_node)
+        for pos, token_node in enumerate(graph.tokens[span.start:span.end]):
+            term_node.tokens.append(token_node)
+            token_node.term = term_node
+            token_node.term_position = pos
+        sentence_node = graph.tokens[span.start].sentence
+        if sentence_node is not None:
+            sentence_node.terms.append(term_node)
+            term_node.sentence = sentence_node
+    if not dependencies:
+        return graph
+    for token in doc:
+        dep_node = graph.tokens[token.i]
+        gov_node = graph.tokens[token.head.i]
+        dep_node.governor = (token.dep_, gov_node)
+        if not token.dep_ == 'ROOT':
+            gov_node.dependents.append((token.dep_, dep_node))
+    return graph
+
+
 def _add_markables(graph, pos_view, term_view):
     """Add nodes to the graph from markables in the views (that is, tokens,
     sentences and terms).""" 
@@ -48,6 +100,9 @@ def _add_markables(graph, pos_view, term_view):
             node = SentenceNode(pos_view.id, anno)
             graph.add_sentence(node)
         elif anno.type.endswith('Token'):
+            # tokens read from a LIF file only have the word feature
+            if anno.text is None:
+                anno.text = anno.features.get('word')
             node = TokenNode(pos_view.id, anno)
             graph.add_token(node)
     for term in term_view.annotations:
@@ -77,16 +132,23 @@ class Graph(object):
         self.sentences = []
         self.tokens = []
         self.terms = []
-        # and an index for all nodes
-        self.nodes_idx = {}
+        # and an index for all nodes, which is created when it is first needed and
+        # which maps view identifiers to dictionaries of annotation identifiers
+        self.nodes_idx = None
+        # sorted start offsets of tokens and terms
+        self.token_starts = []
+        self.term_starts = []
 
     def get_node(self, node_id):
         """Get the node given the node identifier."""
-        return self.nodes_idx.get(node_id)
+        if self.nodes_idx is None:
+            self._index_nodes()
+        view_id, _, annotation_id = node_id.partition(':')
+        return self.nodes_idx.get(view_id, {}).get(annotation_id)
 
     def get_annotation(self, node_id):
         """Get the annotation on a node given the node identifier."""
-        return self.nodes_idx.get(node_id).annotation
+        return self.get_node(node_id).annotation
 
     def add_token(self, node):
         if self.tokens:
@@ -94,6 +156,7 @@ class Graph(object):
             previous.next = node
             node.previous = previous
         self.tokens.append(node)
+        self.token_starts.append(node.annotation.start)
         self._add_node(node)
 
     def add_sentence(self, node):
@@ -102,10 +165,18 @@ class Graph(object):
         
     def add_term(self, node):
         self.terms.append(node)
+        self.term_starts.append(node.annotation.start)
         self._add_node(node)
         
     def _add_node(self, node):
-        self.nodes_idx[node.id] = node
+        if self.nodes_idx is not None:
+            self.nodes_idx.setdefault(node.view_id, {})[node.annotation.id] = node
+
+    def _index_nodes(self):
+        self.nodes_idx = {}
+        for nodes in (self.sentences, self.tokens, self.terms):
+            for node in nodes:
+                self._add_node(node)
 
     def connect(self):
         self._connect_sentences_and_tokens()
@@ -113,28 +184,42 @@ class Graph(object):
         self._connect_terms_and_tokens()
     
     def _connect_sentences_and_tokens(self):
-        for sentence_node in self.sentences:
-            s = sentence_node.annotation
-            for (pos, n) in enumerate(self.tokens_in_range(s.start, s.end)):
-                sentence_node.tokens.append(n) 
+        for sentence_node, tokens in self._sweep(self.sentences, self.tokens):
+            for (pos, n) in enumerate(tokens):
+                sentence_node.tokens.append(n)
                 n.sentence = sentence_node
                 n.sentence_position = pos
 
     def _connect_sentences_and_terms(self):
-        for sentence_node in self.sentences:
-            s = sentence_node.annotation
-            for n in self.terms_in_range(s.start, s.end):
-                sentence_node.terms.append(n) 
+        for sentence_node, terms in self._sweep(self.sentences, self.terms):
+            for n in terms:
+                sentence_node.terms.append(n)
                 n.sentence = sentence_node
-    
+
     def _connect_terms_and_tokens(self):
-        for term_node in self.terms:
-            t = term_node.annotation
-            for (pos, n) in enumerate(self.tokens_in_range(t.start, t.end)):
+        for term_node, tokens in self._sweep(self.terms, self.tokens):
+            for (pos, n) in enumerate(tokens):
                 term_node.tokens.append(n)
                 n.term = term_node
                 n.term_position = pos
 
+    def _sweep(self, containers, nodes):
+        """Generate pairs of a container node and the list of nodes in the range of
+        the container. Since containers are in document order the position where
+        the search for the first node starts only moves forward, which makes a
+        sweep over all containers linear in the number of nodes."""
+        starts = self._starts(nodes)
+        lo = 0
+        previous_start = None
+        for container in containers:
+            p1 = container.annotation.start
+            p2 = container.annotation.end
+            if previous_start is not None and p1 < previous_start:
+                lo = 0
+            previous_start = p1
+            lo = bisect_left(starts, p1, lo)
+            yield container, self._nodes_from(nodes, starts, lo, p2)
+
     def tokens_in_range(self, p1, p2):
         """Get all tokens such that token.start >= p1 and token.end <= p2."""
         return self.nodes_in_range(self.tokens, p1, p2)
@@ -144,16 +229,30 @@ class Graph(object):
         return self.nodes_in_range(self.terms, p1, p2)
 
     def nodes_in_range(self, nodes, p1, p2):
-        """Get all nodes such that node.start >= p1 and node.end <= p2."""
-        # TODO: this operates at O(n), but could be improved to run at O(logn)
+        """Get all nodes such that node.start >= p1 and node.end <= p2. Runs at
+        O(logn) plus the number of nodes in the range."""
+        starts = self._starts(nodes)
+        return self._nodes_from(nodes, starts, bisect_left(starts, p1), p2)
+
+    def _starts(self, nodes):
+        """Return the sorted start offsets for a list of nodes."""
+        if nodes is self.tokens:
+            return self.token_starts
+        elif nodes is self.terms:
+            return self.term_starts
+        return [node.annotation.start for node in nodes]
+
+    @staticmethod
+    def _nodes_from(nodes, starts, i, p2):
+        """Collect nodes from index i onwards that end before p2, stopping at the
+        first node that starts after p2. Nodes from index i are assumed to start at
+        or after the beginning of the range."""
         answer = []
-        for node in nodes:
-            if node.annotation.end < p1:
-                continue
-            elif node.annotation.start >= p1 and node.annotation.end <= p2:
-                answer.append(node)
-            elif node.annotation.start > p2:
+        for i in range(i, len(nodes)):
+            if starts[i] > p2:
                 break
+            if nodes[i].annotation.end <= p2:
+                answer.append(nodes[i])
         return answer
 
     def print_terms(self):
@@ -176,12 +275,19 @@ class Graph(object):
 class Node(object):
 
     """Abstract class for nodes. All nodes have in common that they ar eassociated
-    with a single annotation type from the LIF object."""
-    
+    with a single annotation type from the LIF object. Nodes use slots instead of
+    an instance dictionary since there is one node for each token."""
+
+    __slots__ = ('view_id', 'annotation')
+
     def __init__(self, view_id, annotation):
-        self.id = "%s:%s" % (view_id, annotation.id)
+        self.view_id = view_id
         self.annotation = annotation
 
+    @property
+    def id(self):
+        return "%s:%s" % (self.view_id, self.annotation.id)
+
     def __str__(self):
         return "NODE %s :: %s" % (self.id, self.annotation)
 
@@ -206,6 +312,9 @@ class TokenNode(Node):
 
     """
     
+    __slots__ = ('previous', 'next', 'sentence', 'sentence_position',
+                 'term', 'term_position', 'governor', 'dependents')
+
     def __init__(self, view_id, annotation):
         super().__init__(view_id, annotation)
         self.previous = None
@@ -239,7 +348,9 @@ class SentenceNode(Node):
       terms    -  a list of term nodes contained in the sentence
 
     """
-    
+
+    __slots__ = ('tokens', 'terms')
+
     def __init__(self, view_id, annotation):
         super().__init__(view_id, annotation)
         self.tokens = []
@@ -256,7 +367,9 @@ class TermNode(Node):
       sentence  -  a SentenceNode
 
     """
-        
+
+    __slots__ = ('tokens', 'sentence')
+
     def __init__(self, view_id, annotation):
         super().__init__(view_id, annotation)
         self.tokens = []
@@ -37,6 +37,21 @@ import codecs
 import json
 import subprocess
 
+try:
+    from utils import read_file, open_file
+except ImportError:
+    # when this file is run as a script the code directory is not on the path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from utils import read_file, open_file
+
+
+# separators for JSON strings without any spaces
+COMPACT_SEPARATORS = (',', ':')
+
+
+def _compact(json_obj):
+    return json.dumps(json_obj, separators=COMPACT_SEPARATORS)
+
 
 class LappsObject(object):
 
@@ -45,7 +60,7 @@ class LappsObject(object):
         self.json_file = json_string
         self.json_object = json_object
         if json_file is not None:
-            self.json_string = codecs.open(json_file).read()
+            self.json_string = read_file(json_file)
             self.json_object = json.loads(self.json_string)
         elif json_string is not None:
             self.json_string = json_string
@@ -55,18 +70,34 @@ class LappsObject(object):
             self.json_object = json_object
 
     def write(self, fname=None, pretty=False):
-        # first update the json object for those case where it has been changed
-        json_obj = self.as_json()
-        if pretty:
-            s = json.dumps(json_obj, sort_keys=True, indent=4, separators=(',', ': '))
+        """Write the object to a file or to standard output if there is no file
+        name. The pretty form is indented and has sorted keys, which is nice for
+        debugging, the default is a compact form. The file is compressed if its
+        name ends in .gz or .zst."""
+        if fname is None:
+            self.dump(sys.stdout, pretty)
+            sys.stdout.write("\n")
         else:
-            s = json.dumps(json_obj)
-        fh = sys.stdout if fname is None else codecs.open(fname, 'w')
-        fh.write(s + "\n")
+            with open_file(fname, 'w') as fh:
+                self.dump(fh, pretty)
+                fh.write("\n")
+
+    def dump(self, fh, pretty=False):
+        """Write the object to a file handle, first updating the json object for
+        those cases where it has been changed."""
+        fh.write(self.as_json_string(pretty))
+
+    def as_json_string(self, pretty=True):
+        if pretty:
+            return json.dumps(self.as_json(), sort_keys=True, indent=4, separators=(',', ': '))
+        return json.dumps(self.as_json(), separators=COMPACT_SEPARATORS)
 
 
 class LIF(LappsObject):
 
+    """A LIF object. Views read from JSON create their annotations only when they
+    are used, see the View class."""
+
     def __init__(self, json_file=None, json_string=None, json_object=None):
         LappsObject.__init__(self, json_file, json_string, json_object)
         self.context = "http://vocab.lappsgrid.org/context-1.0.0.jsonld"
@@ -96,8 +127,21 @@ class LIF(LappsObject):
              "views": [v.as_json() for v in self.views]}
         return d
 
-    def as_json_string(self):
-        return json.dumps(self.as_json(), sort_keys=True, indent=4, separators=(',', ': '))
+    def dump(self, fh, pretty=False):
+        """Write the LIF object to a file handle. In the compact form the views are
+        encoded and written one at a time so the JSON string for the whole object
+        is never built."""
+        if pretty:
+            fh.write(self.as_json_string(pretty=True))
+            return
+        fh.write('{"@context":%s,"metadata":%s,"text":%s,"views":['
+                 % (_compact(self.context), _compact(self.metadata),
+                    _compact(self.text.as_json())))
+        for i, view in enumerate(self.views):
+            if i > 0:
+                fh.write(',')
+            fh.write(_compact(view.as_json()))
+        fh.write(']}')
 
     def add_tarsqi_view(self, tarsqidoc):
         view = View()
@@ -172,26 +216,55 @@ class Text(object):
 
 class View(object):
 
+    """A view with annotations. When a view is created from a JSON object the
+    Annotation objects are only created when the annotations are first accessed,
+    until then the view keeps the annotations from the JSON object and writes
+    them back as they are. This way code that only needs some of the views does
+    not pay for creating annotations in the other views."""
+
     def __init__(self, id=None, json_obj=None):
         self.id = id
         self.metadata = {}
-        self.annotations = []
+        self._annotations = []
+        self._json_annotations = None
         if json_obj is not None:
             self.id = json_obj['id']
             self.metadata = json_obj['metadata']
-            for a in json_obj['annotations']:
-                self.annotations.append(Annotation(a))
+            self._annotations = None
+            self._json_annotations = json_obj['annotations']
+
+    @property
+    def annotations(self):
+        if self._annotations is None:
+            self._annotations = [Annotation(a) for a in self._json_annotations]
+            self._json_annotations = None
+        return self._annotations
+
+    @annotations.setter
+    def annotations(self, annotations):
+        self._annotations = annotations
+        self._json_annotations = None
+
+    def is_materialized(self):
+        """Return True if Annotation objects were created for this view."""
+        return self._annotations is not None
 
     def __len__(self):
-        return len(self.annotations)
+        if self._annotations is None:
+            return len(self._json_annotations)
+        return len(self._annotations)
 
     def __str__(self):
-        return "<View id={} with {:d} annotations>".format(self.id, len(self.annotations))
+        return "<View id={} with {:d} annotations>".format(self.id, len(self))
 
     def as_json(self):
+        if self._annotations is None:
+            annotations = self._json_annotations
+        else:
+            annotations = [a.as_json() for a in self._annotations]
         d = {"id": self.id,
              "metadata": self.metadata,
-             "annotations": [a.as_json() for a in self.annotations]}
+             "annotations": annotations}
         return d
 
     def pp(self):
@@ -202,6 +275,8 @@ class View(object):
 
 class Annotation(object):
 
+    __slots__ = ('id', 'type', 'start', 'end', 'target', 'text', 'features', 'vector')
+
     def __init__(self, json_obj):
         self.id = json_obj['id']
         self.type = json_obj['@type']
@@ -209,6 +284,8 @@ class Annotation(object):
         self.end = json_obj.get("end")
         self.target = json_obj.get("target")
         self.text = None
+        # structured feature vector of a term, this is not part of the LIF output
+        self.vector = None
         self.features = {}
         for feat, val in json_obj.get("features", {}).items():
             self.features[feat] = val
@@ -35,5 +35,10 @@ class Logger(object):
     def write_error(self, e):
         self.fh.write('ERROR: %s\n' % e)
 
+    def write_throughput(self, worker, files, seconds):
+        rate = files / seconds if seconds else 0
+        self.fh.write("%s  %d files in %d seconds (%.2f files/second)\n"
+                      % (worker, files, int(seconds), rate))
+
     def write_time_elapsed(self):
         self.fh.write("\ntime elapsed: %s seconds\n" % int(time.time() - self.t0))
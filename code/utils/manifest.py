@@ -0,0 +1,104 @@
+"""manifest.py
+
+A manifest records which inputs of a corpus run were processed successfully.
+It is stored in the output directory as a file with one JSON record per line,
+where each record has the name, size, modification time and content hash of an
+input file, the version of the models it was processed with and the name of the
+output file. Records are appended and flushed as soon as an output file is
+written, so after a crash the manifest has all files that were finished. When
+an input is processed again the last record for it wins.
+
+>>> manifest = Manifest(output_dir)
+>>> if not manifest.is_current(infile, outfile, version):
+...     process(infile, outfile)
+...     manifest.add(infile, outfile, version)
+>>> manifest.close()
+
+An output is current if the manifest has a record for the input with the same
+content hash, model version and output name, and if the output file exists.
+Hashes are cached on size and modification time so unchanged inputs are not
+read again.
+
+"""
+
+import os
+import json
+import hashlib
+
+
+MANIFEST_FILE = '.manifest.jsonl'
+
+
+def file_hash(fname):
+    """Return the SHA-1 hash of the contents of a file."""
+    sha1 = hashlib.sha1()
+    with open(fname, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+class Manifest(object):
+
+    def __init__(self, directory):
+        self.fname = os.path.join(directory, MANIFEST_FILE)
+        self.records = {}
+        self.hashes = {}
+        complete = True
+        if os.path.exists(self.fname):
+            with open(self.fname, encoding='utf8') as fh:
+                for line in fh:
+                    complete = line.endswith('\n')
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # the last line may be incomplete after a crash
+                        continue
+                    self.records[record['input']] = record
+        self.fh = open(self.fname, 'a', encoding='utf8')
+        if not complete:
+            # end the incomplete line so that the next record starts on a new line
+            self.fh.write('\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        self.fh.close()
+
+    def content_hash(self, infile):
+        """Return the content hash of the input file, the hash in the manifest is
+        used if the size and modification time of the file did not change."""
+        if infile not in self.hashes:
+            stat = os.stat(infile)
+            record = self.records.get(os.path.basename(infile))
+            if (record is not None and record['size'] == stat.st_size
+                    and record['mtime'] == stat.st_mtime_ns):
+                self.hashes[infile] = record['hash']
+            else:
+                self.hashes[infile] = file_hash(infile)
+        return self.hashes[infile]
+
+    def is_current(self, infile, outfile, version):
+        record = self.records.get(os.path.basename(infile))
+        return (record is not None
+                and record['hash'] == self.content_hash(infile)
+                and record['version'] == version
+                and record['output'] == os.path.basename(outfile)
+                and os.path.exists(outfile))
+
+    def add(self, infile, outfile, version):
+        """Record that the input file was processed into the output file."""
+        stat = os.stat(infile)
+        record = {"input": os.path.basename(infile),
+                  "size": stat.st_size,
+                  "mtime": stat.st_mtime_ns,
+                  "hash": self.content_hash(infile),
+                  "version": version,
+                  "output": os.path.basename(outfile)}
+        self.records[record['input']] = record
+        self.fh.write(json.dumps(record) + '\n')
+        self.fh.flush()
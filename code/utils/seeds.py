@@ -0,0 +1,181 @@
+"""seeds.py
+
+An index of the lists of technologies and non-technologies in data/lists, used
+by the trainer to label terms.
+
+Terms and seeds are normalized before they are compared: they are lowercased,
+whitespace is collapsed, punctuation at the edges is removed and so are leading
+determiners and possessive pronouns, so "The Digital Thermometer," and "digital
+thermometer" are the same. The normalized seeds are stored in a dictionary for
+exact lookups and in a trie over their tokens, which is used to find seeds
+inside a term:
+
+exact      the term is a seed
+head       the term ends in a seed, for example "digital thermometer" has
+           the head "thermometer"
+substring  the term contains a seed anywhere
+
+For the last two the longest seed that matches wins. Seeds that are on both a
+technology list and a non-technology list get the label '?', and so do terms
+where the longest match is not unique and the matching seeds disagree.
+
+Reading the lists takes a while, so the index is pickled to a file in the lists
+directory and loaded from there the next time, unless the lists changed.
+
+>>> seeds = SeedIndex.load()
+>>> seeds.label('A digital thermometer', match='head')
+'y'
+
+"""
+
+import os
+import re
+import glob
+import pickle
+import tempfile
+
+
+LISTS_DIR = 'data/lists'
+
+MATCHES = ('exact', 'head', 'substring')
+INDEX_FILE = 'seeds-index.pickle'
+
+# format version of the pickled index, change this when the index changes
+VERSION = 1
+
+DETERMINERS = {'a', 'an', 'the', 'this', 'that', 'these', 'those', 'its', 'their',
+               'our', 'his', 'her', 'my', 'your', 'some', 'any', 'each', 'every'}
+
+EDGE_PUNCTUATION = '.,;:!?"\'()[]{}'
+
+WHITESPACE = re.compile(r'\s+')
+
+# key for the label of a seed that ends at a node of the trie, this cannot be a
+# token since tokens are not empty
+LABEL = ''
+
+
+def normalize(term):
+    """Return the normalized tokens of a term as a tuple."""
+    tokens = WHITESPACE.split(term.lower().strip(EDGE_PUNCTUATION + ' \t\n'))
+    while tokens and tokens[0] in DETERMINERS:
+        tokens.pop(0)
+    return tuple(token for token in tokens if token)
+
+
+def read_lists(directory=LISTS_DIR):
+    """Read the lists in the directory and generate <term, label> pairs. Lists of
+    technologies are named tech-*.txt and have one term per line, lists named
+    labels-*.txt have a label, a frequency and a term on each line."""
+    for techlist in sorted(glob.glob(os.path.join(directory, "tech-*.txt"))):
+        print('Reading', techlist)
+        for line in open(techlist):
+            yield line.strip(), 'y'
+    for label_file in sorted(glob.glob(os.path.join(directory, "labels-*.txt"))):
+        print('Reading', label_file)
+        for line in open(label_file):
+            try:
+                (label, freq, tech) = line.rstrip().split('\t')
+                if label in ('y', 'n'):
+                    yield tech.strip(), label
+            except ValueError:
+                print('WARNING:\n%s' % line, end='')
+
+
+def _signature(directory):
+    """Return the names, sizes and modification times of the lists, the index is
+    built again when these change."""
+    fnames = sorted(glob.glob(os.path.join(directory, "tech-*.txt"))
+                    + glob.glob(os.path.join(directory, "labels-*.txt")))
+    return VERSION, [(os.path.basename(f), os.path.getsize(f), os.stat(f).st_mtime_ns)
+                     for f in fnames]
+
+
+class SeedIndex(object):
+
+    def __init__(self, pairs=()):
+        self.labels = {}
+        self.trie = {}
+        self.signature = None
+        for term, label in pairs:
+            self.add(term, label)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @classmethod
+    def load(cls, directory=LISTS_DIR):
+        """Return the index for the lists in the directory, from the pickled index
+        if it is up to date and otherwise from the lists, in which case the index
+        is pickled for the next time."""
+        index_file = os.path.join(directory, INDEX_FILE)
+        signature = _signature(directory)
+        if os.path.exists(index_file):
+            try:
+                with open(index_file, 'rb') as fh:
+                    index = pickle.load(fh)
+                if index.signature == signature:
+                    return index
+            except Exception as e:
+                # a truncated file or an index pickled by an older version of the
+                # code, either way the index is built again
+                print('WARNING: cannot read %s (%s), building a new index'
+                      % (index_file, e))
+        index = cls(read_lists(directory))
+        index.signature = signature
+        index.save(index_file)
+        return index
+
+    def save(self, fname):
+        """Save the index to a temporary file which then replaces fname, so other
+        processes never read a partial index. The file gets the permissions of
+        a file created with open() instead of the private ones from mkstemp."""
+        fd, tmp_name = tempfile.mkstemp(dir=os.path.dirname(fname) or '.')
+        with open(fd, 'wb') as fh:
+            pickle.dump(self, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_name, 0o666 & ~umask)
+        os.replace(tmp_name, fname)
+
+    def add(self, term, label):
+        key = normalize(term)
+        if not key:
+            return
+        if self.labels.get(key, label) != label:
+            label = '?'
+        self.labels[key] = label
+        node = self.trie
+        for token in key:
+            node = node.setdefault(token, {})
+        node[LABEL] = label
+
+    def label(self, term, match='exact'):
+        """Return 'y' if the term matches a technology, 'n' if it matches a
+        non-technology, '?' if it is not clear which one, and None if the
+        term does not match any seed. The match argument is one of 'exact',
+        'head' and 'substring'."""
+        key = normalize(term)
+        label = self.labels.get(key)
+        if label is not None or match == 'exact':
+            return label
+        matches = self._matches(key, match == 'head')
+        if not matches:
+            return None
+        longest = max(length for length, _ in matches)
+        labels = {label for length, label in matches if length == longest}
+        return labels.pop() if len(labels) == 1 else '?'
+
+    def _matches(self, key, head):
+        """Return the length and label of all seeds in the key, only seeds at the
+        end of the key are returned if head is True."""
+        matches = []
+        for start in range(len(key)):
+            node = self.trie
+            for end in range(start, len(key)):
+                node = node.get(key[end])
+                if node is None:
+                    break
+                if LABEL in node and (not head or end == len(key) - 1):
+                    matches.append((end - start + 1, node[LABEL]))
+        return matches
@@ -0,0 +1,311 @@
+"""store.py
+
+A binary columnar format for processed documents, as an alternative to LIF JSON
+files. A store file holds the same information as a LIF object, but each view is
+stored as a set of typed columns:
+
+- identifiers and annotation types as strings and dictionary-encoded strings
+- start and end offsets as arrays of 64-bit integers (-1 is used for None)
+- features as one column per feature name, with integer features as arrays of
+  64-bit integers if they all fit, string features as dictionary-encoded
+  strings and all other values as JSON strings
+
+For each annotation the list of feature names is stored too, so the order of
+features and whether a feature is present survive the round trip. A store file
+can be converted to a LIF object and back without losing anything.
+
+The file starts with a magic string and the length of a JSON header, which is
+followed by the header and the column data. The header has the LIF metadata,
+the metadata for the views and for each column the position of its data. Store
+files are memory mapped and only the columns of the views that are asked for
+are read, so reading the terms of a document takes time proportional to the
+number of terms and not to the size of the document.
+
+>>> write_store(lif, 'doc.lifs')
+>>> lif = read_store('doc.lifs', views=['terms'])
+>>> store = Store('doc.lifs')
+>>> starts = store.column('terms', 'start')
+
+"""
+
+import sys
+import json
+import mmap
+import struct
+from array import array
+
+from utils.lif import LIF, View, Annotation
+
+
+STORE_EXTENSION = '.lifs'
+
+MAGIC = b'LIFSTORE'
+VERSION = 1
+
+# columns with a dictionary encoding are only used if the number of distinct
+# values is at most this fraction of the number of values
+DICTIONARY_RATIO = 0.5
+
+# range of the integers that fit in an integer column
+MIN_INT = -2 ** 63
+MAX_INT = 2 ** 63 - 1
+
+
+def is_store_file(fname):
+    return fname.endswith(STORE_EXTENSION)
+
+
+def load_lif(fname, views=None, text=True):
+    """Load a LIF object from a store file or from a LIF JSON file, which may be
+    compressed. For store files only the views in the views list are loaded, or
+    all views if views is None, and the text is only loaded if text is True."""
+    if is_store_file(fname):
+        return read_store(fname, views, text)
+    return LIF(fname)
+
+
+def write_lif(lif, fname, pretty=False):
+    """Write the LIF object to a store file or to a LIF JSON file, depending on the
+    extension of the file name."""
+    if is_store_file(fname):
+        write_store(lif, fname)
+    else:
+        lif.write(fname, pretty=pretty)
+
+
+def write_store(lif, fname):
+    """Write the LIF object to a store file."""
+    columns = ColumnWriter()
+    header = {"version": VERSION,
+              "byteorder": sys.byteorder,
+              "context": lif.context,
+              "metadata": lif.metadata,
+              "language": lif.text.language,
+              "text": columns.add_strings([lif.text.value]),
+              "views": [_encode_view(view, columns) for view in lif.views]}
+    columns.write(fname, header)
+
+
+def read_store(fname, views=None, text=True):
+    """Read a store file and return a LIF object with the views in the views list,
+    or with all views if views is None. The text is not loaded if text is False,
+    which is fine for code that only needs the annotations."""
+    with Store(fname) as store:
+        return store.as_lif(views, text)
+
+
+class ColumnWriter(object):
+
+    """Collects the data for columns and writes them to a store file."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def add_array(self, typecode, values):
+        """Add an array of numbers and return a reference to it."""
+        data = array(typecode, values).tobytes()
+        ref = {"offset": self.size, "length": len(data), "typecode": typecode}
+        self.chunks.append(data)
+        self.size += len(data)
+        padding = -self.size % 8
+        if padding:
+            self.chunks.append(b'\0' * padding)
+            self.size += padding
+        return ref
+
+    def add_strings(self, strings):
+        """Add a list of strings as an array of offsets into a blob of UTF-8 data."""
+        offsets = [0]
+        encoded = []
+        for s in strings:
+            b = s.encode('utf8')
+            encoded.append(b)
+            offsets.append(offsets[-1] + len(b))
+        return {"offsets": self.add_array('q', offsets),
+                "data": self.add_array('B', b''.join(encoded))}
+
+    def add_string_column(self, strings):
+        """Add a column of strings, using a dictionary encoding if there are many
+        repeated values."""
+        table = {}
+        codes = [table.setdefault(s, len(table)) for s in strings]
+        if len(table) <= DICTIONARY_RATIO * len(strings):
+            return {"encoding": "dictionary",
+                    "codes": self.add_array('i', codes),
+                    "table": self.add_strings(list(table))}
+        return {"encoding": "plain", "strings": self.add_strings(strings)}
+
+    def write(self, fname, header):
+        header = json.dumps(header).encode('utf8')
+        header += b' ' * (-(len(MAGIC) + 8 + len(header)) % 8)
+        with open(fname, 'wb') as fh:
+            fh.write(MAGIC)
+            fh.write(struct.pack('<Q', len(header)))
+            fh.write(header)
+            for chunk in self.chunks:
+                fh.write(chunk)
+
+
+def _encode_view(view, columns):
+    annotations = view.annotations
+    encoded = {"id": view.id, "metadata": view.metadata, "size": len(annotations),
+               "columns": {}, "features": {}}
+    cols = encoded["columns"]
+    cols["id"] = columns.add_string_column([a.id for a in annotations])
+    cols["type"] = columns.add_string_column([a.type for a in annotations])
+    cols["start"] = columns.add_array('q', [_offset(a.start) for a in annotations])
+    cols["end"] = columns.add_array('q', [_offset(a.end) for a in annotations])
+    if any(a.target is not None for a in annotations):
+        cols["target"] = columns.add_string_column(
+            [json.dumps(a.target) for a in annotations])
+    cols["schema"] = columns.add_string_column(
+        [json.dumps(list(a.features)) for a in annotations])
+    values = {}
+    for a in annotations:
+        for feat, val in a.features.items():
+            values.setdefault(feat, []).append(val)
+    for feat, vals in values.items():
+        encoded["features"][feat] = _encode_values(vals, columns)
+    return encoded
+
+
+def _offset(offset):
+    return -1 if offset is None else offset
+
+
+def _encode_values(values, columns):
+    """Encode the values of a feature, these are only the values of annotations that
+    actually have the feature."""
+    if all(type(v) is int and MIN_INT <= v <= MAX_INT for v in values):
+        return {"kind": "int", "values": columns.add_array('q', values)}
+    elif all(type(v) is str for v in values):
+        return {"kind": "str", "values": columns.add_string_column(values)}
+    return {"kind": "json",
+            "values": columns.add_string_column([json.dumps(v) for v in values])}
+
+
+class Store(object):
+
+    """Read access to a memory mapped store file. Columns are only read when they
+    are asked for."""
+
+    def __init__(self, fname):
+        self.fname = fname
+        self.fh = open(fname, 'rb')
+        self.mm = mmap.mmap(self.fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError("not a store file: %s" % fname)
+        (header_length,) = struct.unpack('<Q', self.mm[len(MAGIC):len(MAGIC) + 8])
+        header_start = len(MAGIC) + 8
+        self.header = json.loads(self.mm[header_start:header_start + header_length])
+        self.data_start = header_start + header_length
+        self.swap = self.header['byteorder'] != sys.byteorder
+        self.views = {view['id']: view for view in self.header['views']}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        try:
+            self.mm.close()
+        except BufferError:
+            # columns handed out by column() still point into the map, it will be
+            # closed when they are garbage collected
+            pass
+        self.fh.close()
+
+    def view_ids(self):
+        return [view['id'] for view in self.header['views']]
+
+    def text(self):
+        return self._strings(self.header['text'])[0]
+
+    def column(self, view_id, name):
+        """Return a column of a view as an array of integers or a list of strings.
+        Integer columns of the same byte order as this machine are returned as
+        memoryviews on the memory mapped file, without any copying."""
+        view = self.views[view_id]
+        if name in view['columns']:
+            ref = view['columns'][name]
+        else:
+            ref = view['features'][name]['values']
+        if 'typecode' in ref:
+            return self._array(ref)
+        return self._string_column(ref)
+
+    def get_view(self, view_id):
+        """Create a View with Annotation objects from the columns of a view."""
+        view = self.views[view_id]
+        cols = view['columns']
+        ids = self._string_column(cols['id'])
+        types = self._string_column(cols['type'])
+        starts = self._array(cols['start'])
+        ends = self._array(cols['end'])
+        targets = None
+        if 'target' in cols:
+            targets = [json.loads(t) for t in self._string_column(cols['target'])]
+        schemas = [json.loads(s) for s in self._string_column(cols['schema'])]
+        values = {feat: iter(self._values(encoded))
+                  for feat, encoded in view['features'].items()}
+        result = View(view['id'])
+        result.metadata = view['metadata']
+        for i in range(view['size']):
+            anno = {"id": ids[i], "@type": types[i],
+                    "features": {feat: next(values[feat]) for feat in schemas[i]}}
+            if starts[i] != -1:
+                anno["start"] = starts[i]
+            if ends[i] != -1:
+                anno["end"] = ends[i]
+            if targets is not None and targets[i] is not None:
+                anno["target"] = targets[i]
+            result.annotations.append(Annotation(anno))
+        return result
+
+    def as_lif(self, views=None, text=True):
+        """Return a LIF object with the views asked for, or all views if views is
+        None, in the order of the store file."""
+        lif = LIF()
+        lif.context = self.header['context']
+        lif.metadata = self.header['metadata']
+        lif.text.language = self.header['language']
+        if text:
+            lif.text.value = self.text()
+        for view_id in self.view_ids():
+            if views is None or view_id in views:
+                lif.views.append(self.get_view(view_id))
+        return lif
+
+    def _values(self, encoded):
+        if encoded['kind'] == 'int':
+            return self._array(encoded['values'])
+        values = self._string_column(encoded['values'])
+        if encoded['kind'] == 'json':
+            return [json.loads(v) for v in values]
+        return values
+
+    def _array(self, ref):
+        start = self.data_start + ref['offset']
+        data = memoryview(self.mm)[start:start + ref['length']]
+        if not self.swap:
+            return data.cast(ref['typecode'])
+        values = array(ref['typecode'])
+        values.frombytes(data)
+        values.byteswap()
+        return values
+
+    def _strings(self, ref):
+        offsets = self._array(ref['offsets'])
+        data = self._array(ref['data'])
+        return [str(data[offsets[i]:offsets[i + 1]], 'utf8')
+                for i in range(len(offsets) - 1)]
+
+    def _string_column(self, ref):
+        if ref['encoding'] == 'dictionary':
+            table = self._strings(ref['table'])
+            return [table[code] for code in self._array(ref['codes'])]
+        return self._strings(ref['strings'])